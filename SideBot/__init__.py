@@ -1,7 +1,10 @@
 """Main module for the SideBot."""
 
 # pylint: disable=C0103,C0114
+import asyncio
+import datetime
 import logging
+import time
 import typing
 
 import yaml
@@ -10,9 +13,13 @@ import discord
 from discord.ext import commands
 from discord.ext.commands import AutoShardedBot, Bot, when_mentioned_or
 
-from SideBot.db.tags import Tag
+from SideBot.db.migrations import migrate
+from SideBot.db.notify import TagListener
+from SideBot.db.pool import DBPool
+from SideBot.db.snapshot import load_snapshot, save_snapshot
+from SideBot.db.tags import TagRepository, name_index, tag_cache, usage_buffer
 
-from .utils import ButtonLink, DiscordUser, BotConfig
+from .utils import BotConfig
 
 
 class SideBot(Bot):
@@ -32,19 +39,83 @@ class SideBot(Bot):
 
         self.owner_id = self.config.owner
         self.conf_cogs = self.config.cogs
-
-    async def setup_connection(self) -> asyncpg.Connection:
-        """Set up the database connection."""
-        return await asyncpg.connect(self.config.db_url)
+        self.pool: DBPool
+        self.tags: TagRepository
+        self.reconcile_task: asyncio.Task[None] | None = None
+        self.index_synced_at: float | None = None
+        self.tag_listener: TagListener | None = None
+
+    async def setup_pool(self) -> DBPool:
+        """Migrate the database schema and set up the connection pool."""
+        # The codecs registered on pool connections need the composite types,
+        # so migrations run on a one-off connection first.
+        conn: asyncpg.Connection = await asyncpg.connect(self.config.db_url)
+        try:
+            version = await migrate(conn)
+        finally:
+            await conn.close()
+        self.logger.info("Database schema is at version %s", version)
+        tag_cache.configure(self.config.tag_cache.max_entries, self.config.tag_cache.ttl)
+        usage_buffer.flush_interval = self.config.tag_usage.flush_interval
+        usage_buffer.max_pending = self.config.tag_usage.max_pending
+        return await DBPool.create(self.config.db_url, self.config.pool, self.config.replica_urls)
 
     async def setup_hook(self) -> None:
-        """Set up cogs and app commands."""
+        """Set up the database pool, cogs and app commands."""
+        self.pool = await self.setup_pool()
+        self.logger.info("Connected to postgresql!")
+        self.tags = TagRepository(self.pool)
+        self.tags.track_usage()
+        # Listen before loading the index, so no change in between is missed.
+        # If LISTEN comes up late, the listener sends a RESET that reloads the index.
+        self.tag_listener = TagListener(self.config.db_url)
+        self.tag_listener.subscribe(self.tags.apply_event)
+        await self.tag_listener.start()
+        await self.load_tag_index()
         for cog in self.config.cogs:
             await self.load_extension(f"SideBot.cogs.{cog}")
         self.logger.debug(self.extensions)
         self.logger.debug(self.tree.get_commands())
         self.logger.info("Set up hook done!")
 
+    async def load_tag_index(self) -> None:
+        """Load the tag name index from the snapshot if there is one, otherwise from the database."""
+        path = self.config.tag_snapshot
+        saved_at = load_snapshot(path, name_index) if path else None
+        if saved_at is None:
+            synced_at = time.time()
+            await self.tags.load_index()
+            self.index_synced_at = synced_at
+            return
+        self.logger.info("Loaded %s tag names from %s", len(name_index), path)
+        # Give tags written just before the snapshot some slack for clock skew.
+        since = datetime.datetime.fromtimestamp(saved_at) - datetime.timedelta(minutes=5)  # noqa: DTZ006
+        self.reconcile_task = asyncio.create_task(self.reconcile_tag_index(since))
+
+    async def reconcile_tag_index(self, since: datetime.datetime) -> None:
+        """Apply the tag changes made since the snapshot, reloading the whole index if that fails."""
+        synced_at = time.time()
+        try:
+            await self.tags.reconcile_index(since)
+        except Exception:
+            self.logger.exception("Failed to reconcile the tag snapshot, reloading every tag name")
+            await self.tags.load_index()
+        self.index_synced_at = synced_at
+
+    def save_tag_index(self) -> None:
+        """Save the tag name index to the snapshot, if it was ever in sync with the database."""
+        path = self.config.tag_snapshot
+        if not path or self.index_synced_at is None:
+            return
+        # Stamped with the last sync rather than now, so the next start also
+        # picks up tags changed by other processes while this one ran.
+        try:
+            save_snapshot(path, name_index, self.index_synced_at)
+        except OSError:
+            self.logger.exception("Failed to save the tag snapshot to %s", path)
+            return
+        self.logger.info("Saved %s tag names to %s", len(name_index), path)
+
     async def on_ready(self) -> None:
         """Handle bot ready status."""
         if self.user:
@@ -53,28 +124,21 @@ class SideBot(Bot):
                 self.user,
                 self.user.id,
             )
-            self.connection: asyncpg.Connection = await self.setup_connection()
-            self.logger.info("Connected to postgresql!")
-
-            await Tag.write_schema(self.connection)
-
-            await self.connection.set_type_codec(
-                "discorduser",
-                encoder=DiscordUser.to_tuple,
-                decoder=DiscordUser.from_tuple,
-                format="tuple",
-            )
-
-            await self.connection.set_type_codec(
-                "buttonlink",
-                encoder=ButtonLink.to_tuple,
-                decoder=ButtonLink.from_tuple,
-                format="tuple",
-            )
-
         else:
             self.logger.error("Error getting user")
 
+    async def close(self) -> None:
+        """Close the gateway connection, flush buffered tag usage, then close the database pool."""
+        await super().close()
+        if self.tag_listener is not None:
+            await self.tag_listener.stop()
+        if hasattr(self, "pool"):
+            await usage_buffer.stop()
+            if self.reconcile_task is not None and not self.reconcile_task.done():
+                self.reconcile_task.cancel()
+            self.save_tag_index()
+            await self.pool.close()
+
     # pylint: disable=W0221
     async def on_command_error(
         self,
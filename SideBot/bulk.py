@@ -0,0 +1,65 @@
+"""Command line entrypoint for bulk tag import/export.
+
+Usage:
+    python -m SideBot.bulk export [--guild ID] [--format jsonl|csv] [--config conf.yaml] FILE
+    python -m SideBot.bulk import [--guild ID] [--format jsonl|csv] [--config conf.yaml] FILE
+
+Use `-` as FILE for stdout/stdin.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import BinaryIO
+
+import yaml
+
+from SideBot.db.bulk import Format, export_tags, import_tags
+from SideBot.db.pool import DBPool
+from SideBot.utils import BotConfig, PoolConfig
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the requested bulk operation."""
+    with open(args.config) as f:
+        config = BotConfig.from_dict(yaml.safe_load(f))
+    pool = await DBPool.create(
+        config.db_url,
+        PoolConfig(1, 1, config.pool.acquire_timeout, config.pool.prepared_statements),
+        # Exports only read, so they can run against a replica.
+        config.replica_urls if args.command == "export" else (),
+    )
+    fmt: Format = args.format or ("csv" if args.file.endswith(".csv") else "jsonl")
+    try:
+        if args.command == "export":
+            out: BinaryIO = sys.stdout.buffer if args.file == "-" else open(args.file, "wb")  # noqa: SIM115
+            try:
+                await export_tags(pool, out, fmt, args.guild)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+        else:
+            src: BinaryIO = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")  # noqa: SIM115
+            try:
+                count = await import_tags(pool, src, fmt, args.guild)
+            finally:
+                if src is not sys.stdin.buffer:
+                    src.close()
+            print(f"Imported {count} tags", file=sys.stderr)
+    finally:
+        await pool.close()
+
+
+def main() -> None:
+    """Parse the command line and run."""
+    parser = argparse.ArgumentParser(prog="python -m SideBot.bulk", description="Bulk import/export SideBot tags.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("file", help="file to read or write, - for stdin/stdout")
+    parser.add_argument("--guild", type=int, default=None, help="only export this guild / import into this guild")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="defaults to the file extension")
+    parser.add_argument("--config", default="conf.yaml")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
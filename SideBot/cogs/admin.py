@@ -1,70 +1,23 @@
 """Admin cog with commands for moderation."""
 
-import asyncio
 import logging
+from collections.abc import Iterable
 from datetime import timedelta
 
 import discord
-from discord import Interaction, Member, Message, TextChannel
+from discord import Interaction, Member, Message, RawBulkMessageDeleteEvent, RawMessageDeleteEvent, TextChannel
+from discord.abc import GuildChannel
 from discord.app_commands import command, default_permissions, describe, errors
 from discord.ext import tasks
 from discord.ext.commands import Bot
 
-from .basecog import BaseCog
-
-
-class SpamMessage:
-    """A message representation."""
-
-    __slots__ = ("i",)
-
-    def __init__(self, i: int) -> None:
-        """Initialize the message with the id."""
-        self.i = i
-
-    def __repr__(self) -> str:
-        """Return the message representation."""
-        return f"SpamMessage(i={self.i})"
-
-
-class SpamChannel:
-    """A channel representation that holds messages."""
-
-    __slots__ = ("i", "messages")
-
-    def __init__(self, i: int, messages: list[SpamMessage]) -> None:
-        """Initialize the channel with the id and messages."""
-        self.i = i
-        self.messages = messages
-
-    def __repr__(self) -> str:
-        """Return the channel representation."""
-        return f"SpamChannel(i={self.i}, messages={len(self.messages)})"
+from SideBot.moderation.actions import ModerationQueue
+from SideBot.moderation.clean import CleanJob, CleanProgress
+from SideBot.moderation.fingerprint import FingerprintSketch
+from SideBot.moderation.history import MessageHistory
+from SideBot.moderation.spam import SpamTracker
 
-    def get_message(self, i: int) -> SpamMessage | None:
-        """Get the message given the id, otherwise returns None."""
-        m = [m for m in self.messages if m.i == i]
-        return None if len(m) == 0 else m[0]
-
-
-class SpamUser:
-    """A user representation that holds channels."""
-
-    __slots__ = ("i", "channels")
-
-    def __init__(self, i: int, channels: list[SpamChannel]) -> None:
-        """Initialize the user with the id and channels."""
-        self.i = i
-        self.channels = channels
-
-    def __repr__(self) -> str:
-        """Return the user representation."""
-        return f"SpamUser(i={self.i}, channels={len(self.channels)})"
-
-    def get_channel(self, i: int) -> SpamChannel | None:
-        """Get the channel given the id, otherwise returns None."""
-        c = [c for c in self.channels if c.i == i]
-        return None if len(c) == 0 else c[0]
+from .basecog import BaseCog
 
 
 class Admin(BaseCog):
@@ -76,13 +29,39 @@ class Admin(BaseCog):
         logging.getLogger(__name__).info("Initialized %s", cls.__name__)
         await bot.add_cog(cls(bot))
 
-    def __init__(self, bot: Bot, channels_max: int = 4) -> None:
-        """Initialize the cog with the bot and the maximum channels to check."""
-        self.spammers: list[SpamUser] = []
-        self.clear_spammers.start()  # pylint: disable=E1101
+    def __init__(
+        self,
+        bot: Bot,
+        channels_max: int = 4,
+        users_max: int = 5,
+        spam_window: float = 1800.0,
+        history_size: int = 500,
+    ) -> None:
+        """Initialize the cog with the bot, the spam detection settings and the messages kept per channel."""
+        self.history = MessageHistory(history_size)
+        self.actions = ModerationQueue()
+        self.spam = SpamTracker(spam_window)
+        self.fingerprints = FingerprintSketch(spam_window, channels_max, users_max)
         self.description = "This is the moderation cog"
         self.channels_max = channels_max
+        self.users_max = users_max
+        self.new_account_age = timedelta(days=7)
         super().__init__(bot)
+        self.sweep_spam.start()  # pylint: disable=E1101
+
+    async def cog_unload(self) -> None:
+        """Stop sweeping the spam state and running moderation actions."""
+        self.sweep_spam.cancel()  # pylint: disable=E1101
+        await self.actions.stop()
+
+    def spam_stats(self) -> dict[str, dict[str, int]]:
+        """Return the entry counts and approximate bytes of the spam state."""
+        return {
+            "members": self.spam.stats,
+            "fingerprints": self.fingerprints.stats,
+            "history": self.history.stats,
+            "actions": self.actions.stats,
+        }
 
     @command(name="clean", description="Clean messages from channel")
     @describe(count="Amount of messages to delete")
@@ -103,34 +82,35 @@ class Admin(BaseCog):
                 ephemeral=True,
             )
         await inter.response.defer(ephemeral=True)
-        del_messages: list[Message] = []
         if cross_channel:
-            if inter.guild is None or inter.guild.text_channels is None:
+            if inter.guild is None or not inter.guild.text_channels:
                 return await inter.followup.send("No text channels found in the guild.", ephemeral=True)
-            for channel in inter.guild.text_channels:
-                async for message in channel.history(limit=200):
-                    if len(del_messages) >= count:
-                        break
-                    if member is not None:
-                        if message.author == member:
-                            del_messages.append(message)
-                    else:
-                        del_messages.append(message)
-                await channel.delete_messages(del_messages)
-                del_messages = []
-            return None
-        if member:
-            async for message in inter.channel.history(limit=200):
-                if len(del_messages) >= count:
-                    break
-                if message.author == member:
-                    del_messages.append(message)
-            await inter.channel.delete_messages(del_messages)
+            me = inter.guild.me
+            channels = [
+                channel
+                for channel in inter.guild.text_channels
+                if (perms := channel.permissions_for(me)).read_message_history and perms.manage_messages
+            ]
         else:
-            del_messages = await inter.channel.purge(limit=count)
-        await inter.followup.send(
-            f"Attempted to delete {count} messages, actually deleted {len(del_messages)}!",
-            ephemeral=True,
+            channels = [inter.channel]
+
+        async def report(progress: CleanProgress) -> None:
+            await inter.edit_original_response(
+                content=f"Scanned {progress.scanned}/{progress.channels} channels, "
+                f"deleted {progress.deleted}/{count} messages...",
+            )
+
+        job = CleanJob(
+            channels,
+            count,
+            member_id=member.id if member else None,
+            history=self.history,
+            on_progress=report,
+        )
+        progress = await job.run()
+        failed = f" ({progress.failed} could not be deleted)" if progress.failed else ""
+        await inter.edit_original_response(
+            content=f"Attempted to delete {count} messages, actually deleted {progress.deleted}!{failed}",
         )
         return None
 
@@ -148,65 +128,93 @@ class Admin(BaseCog):
             )
         return await inter.response.send_message(f"{err}", ephemeral=True)
 
-    @tasks.loop(minutes=30)
-    async def clear_spammers(self) -> None:
-        """Clear the current 'spammer' list."""
-        self.logger.debug(self.spammers)
-        self.spammers = []
-        self.logger.debug("Cleared spammers")
+    @command(name="spam_stats", description="Show the memory used by spam detection")
+    @default_permissions(administrator=True)
+    async def spam_stats_command(self, inter: Interaction) -> None:
+        """Show the entry counts and approximate bytes of the spam state, for the bot owner."""
+        if self.bot.owner_id != inter.user.id:
+            return await inter.response.send_message("Only the bot owner can see spam stats.", ephemeral=True)
+        lines = [
+            f"{name}: " + ", ".join(f"{key}={value}" for key, value in stats.items())
+            for name, stats in self.spam_stats().items()
+        ]
+        return await inter.response.send_message("\n".join(lines), ephemeral=True)
+
+    @tasks.loop(minutes=10)
+    async def sweep_spam(self) -> None:
+        """Drop spam state that left the window in idle guilds and log its size."""
+        self.spam.sweep()
+        self.fingerprints.sweep()
+        self.actions.prune()
+        self.logger.info("Spam state: %s", self.spam_stats())
+
+    @BaseCog.listener()
+    async def on_ready(self) -> None:
+        """Forget the message history, messages sent while disconnected were never seen."""
+        self.history.clear()
+
+    @BaseCog.listener()
+    async def on_raw_message_delete(self, payload: RawMessageDeleteEvent) -> None:
+        """Mark a deleted message in the message history."""
+        self.history.forget(payload.channel_id, (payload.message_id,))
+
+    @BaseCog.listener()
+    async def on_raw_bulk_message_delete(self, payload: RawBulkMessageDeleteEvent) -> None:
+        """Mark bulk deleted messages in the message history."""
+        self.history.forget(payload.channel_id, payload.message_ids)
+
+    @BaseCog.listener()
+    async def on_guild_channel_delete(self, channel: GuildChannel) -> None:
+        """Drop the message history of a deleted channel."""
+        self.history.drop(channel.id)
 
     @BaseCog.listener()
     async def on_message(self, message: Message) -> None:
-        """Handle messages to detect for spam."""
-        if self.bot.user is None or message.guild is None or message.author.id == self.bot.user.id:
+        """Handle messages to keep the message history and detect for spam."""
+        if message.guild is None:
             return
-        if message.author.id not in [su.i for su in self.spammers]:
-            self.spammers.append(
-                SpamUser(
-                    message.author.id,
-                    [
-                        SpamChannel(
-                            message.channel.id,
-                            [SpamMessage(message.id)],
-                        ),
-                    ],
-                ),
-            )
+        self.history.record(message.channel.id, message.id, message.author.id)
+        if self.bot.user is None or message.author.id == self.bot.user.id:
             return
-        cur = next(su for su in self.spammers if su.i == message.author.id)
-        curch = cur.get_channel(message.channel.id)
-        if curch:
-            curch.messages.append(SpamMessage(message.id))
-        else:
-            cur.channels.append(
-                SpamChannel(message.channel.id, [SpamMessage(message.id)]),
-            )
-
-        if len(cur.channels) >= self.channels_max:
-            self.logger.info(
-                "Spammer alert! %s has sent messages to %s different channels recently!",
-                message.author.name,
-                len(cur.channels),
-            )
-            if not isinstance(message.author, discord.User):
-                await message.author.timeout(
+        guild = message.guild
+        self.spam.record(guild.id, message.author.id, message.channel.id, message.id)
+        duplicate = self.fingerprints.record(
+            guild.id,
+            message.author.id,
+            message.channel.id,
+            message.id,
+            message.content,
+            new_account=discord.utils.utcnow() - message.author.created_at < self.new_account_age,
+        )
+        if duplicate is None:
+            return
+        self.logger.info(
+            "Spammer alert! %s sent content %s users posted to %s different channels recently!",
+            message.author.name,
+            duplicate.users,
+            duplicate.channels,
+        )
+        spammers = {user_id for user_id, _, _ in duplicate.messages}
+        for _, channel_id, message_id in duplicate.messages:
+            self.queue_deletion(channel_id, (message_id,))
+        for user_id in spammers:
+            # Raids can sweep up honest members, so only their copies go, not everything they posted.
+            recent = self.spam.pop(guild.id, user_id) if not duplicate.raid else {}
+            for channel_id, message_ids in recent.items():
+                self.queue_deletion(channel_id, message_ids)
+            member = message.author if user_id == message.author.id else guild.get_member(user_id)
+            if isinstance(member, Member):
+                self.actions.timeout(
+                    member,
                     timedelta(seconds=30),
-                    reason=f"For spamming {len(cur.channels)} channels",
+                    reason=f"For spamming the same content in {duplicate.channels} channels",
                 )
-            del_chans = []
-            for channel in cur.channels:
-                chan = self.bot.get_channel(channel.i)
-                if isinstance(chan, TextChannel):
-                    del_chans.append(
-                        chan.delete_messages(
-                            [chan.get_partial_message(msg.i) for msg in channel.messages],
-                        ),
-                    )
-            await asyncio.gather(*del_chans)
-            # await message.channel.send(f"Spammer alert! {message.author.name}
-            # has sent messages to {len(cur)} different channels recently!", delete_after=5)
-            self.spammers.pop(self.spammers.index(cur))
-        self.logger.debug(self.spammers)
+
+    def queue_deletion(self, channel_id: int, message_ids: Iterable[int]) -> None:
+        """Queue the deletion of messages in a text channel."""
+        channel = self.bot.get_channel(channel_id)
+        if isinstance(channel, TextChannel):
+            self.actions.delete(channel, message_ids)
 
 
 setup = Admin.setup
@@ -1,8 +1,10 @@
 """prelimitary tags cog, will be updated later."""
 
+import abc
 import datetime
 import logging
 import re
+import tempfile
 import traceback
 import typing
 
@@ -10,11 +12,17 @@ import discord
 from discord import app_commands
 from discord.app_commands import command as acommand
 from discord.app_commands import guild_only
+from discord.ext import tasks
 from discord.ext.commands import Bot
+from discord.types.embed import Embed as EmbedPayload
 
 from SideBot import SideBot
 from SideBot.cogs.basecog import BaseCog
+from SideBot.db.bulk import export_tags, import_tags
+from SideBot.db.cache import LRUCache
+from SideBot.db.notify import TagEvent
 from SideBot.db.tags import Tag as DBTag
+from SideBot.db.tags import TagRepository, name_index
 from SideBot.utils import ButtonLink, DiscordUser
 
 
@@ -60,10 +68,11 @@ class UpdateTagsModal(discord.ui.Modal, title="Update a Tag"):
                 ],
                 ephemeral=True,
             )
-        tagobj: DBTag = await DBTag.get(interaction.guild.id, self.tagname.value, interaction.client.connection)
-        tagobj.updated_at = datetime.datetime.now(tz=datetime.UTC)
-        tagobj.content = self.content.value
-        await tagobj.update()
+        tagobj = await interaction.client.tags.get(interaction.guild.id, self.tagname.value, count=False)
+        await interaction.client.tags.update(
+            tagobj.replace(content=self.content.value),
+            DiscordUser.from_dpy_user(interaction.user),
+        )
         await interaction.response.send_message(
             embeds=[
                 discord.Embed(
@@ -137,19 +146,13 @@ class CreateTagsModal(discord.ui.Modal, title="Create a Tag"):
                 ],
                 ephemeral=True,
             )
-        tagobj: DBTag = DBTag(
+        tagobj = DBTag.new(
             interaction.guild.id,
             self.tagname.value,
             self.content.value,
             DiscordUser.from_dpy_user(interaction.user),
-            datetime.datetime.now(tz=datetime.UTC),
-            datetime.datetime.now(tz=datetime.UTC),
-            [],
-            0,
-            None,
-            interaction.client.connection,
         )
-        await tagobj.create()
+        await interaction.client.tags.create(tagobj)
         await interaction.response.send_message(
             embeds=[
                 discord.Embed(
@@ -181,6 +184,229 @@ class CreateTagsModal(discord.ui.Modal, title="Create a Tag"):
         traceback.print_exception(type(error), error, error.__traceback__)
 
 
+class PagedView(discord.ui.View, abc.ABC):
+    """A view with previous/next buttons that only its invoker can use."""
+
+    def __init__(self, user_id: int) -> None:
+        """Initialize the view for `user_id`."""
+        super().__init__(timeout=300)
+        self.user_id = user_id
+
+    @abc.abstractmethod
+    async def load(self) -> discord.Embed:
+        """Fetch the current page and return its embed."""
+
+    @abc.abstractmethod
+    def step(self, forward: bool) -> None:  # noqa: FBT001
+        """Move to the next page, or the previous one."""
+
+    @typing.override
+    async def interaction_check(self, interaction: discord.Interaction[discord.Client]) -> bool:
+        return interaction.user.id == self.user_id
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(
+        self,
+        interaction: discord.Interaction[discord.Client],
+        _: discord.ui.Button["PagedView"],
+    ) -> None:
+        """Go back to the previous page."""
+        self.step(forward=False)
+        await interaction.response.edit_message(embed=await self.load(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(
+        self,
+        interaction: discord.Interaction[discord.Client],
+        _: discord.ui.Button["PagedView"],
+    ) -> None:
+        """Go to the next page."""
+        self.step(forward=True)
+        await interaction.response.edit_message(embed=await self.load(), view=self)
+
+
+class TagListView(PagedView):
+    """Paginated listing of a guild's tags, fetched one page at a time."""
+
+    def __init__(
+        self,
+        guild_id: int,
+        tags: TagRepository,
+        user_id: int,
+        *,
+        by_usage: bool = False,
+        page_size: int = 25,
+    ) -> None:
+        """Initialize the listing on its first page."""
+        super().__init__(user_id)
+        self.guild_id = guild_id
+        self.tags = tags
+        self.by_usage = by_usage
+        self.page_size = page_size
+        # The key each visited page starts after, the last one is the current page.
+        self.cursors: list[tuple[str, int] | None] = [None]
+        self.rows: list[tuple[str, int]] = []
+        self.sort.label = "Sort by name" if by_usage else "Sort by usage"
+
+    @typing.override
+    async def load(self) -> discord.Embed:
+        rows = await self.tags.page(
+            self.guild_id,
+            self.cursors[-1],
+            self.page_size + 1,
+            by_usage=self.by_usage,
+        )
+        self.rows = rows[: self.page_size]
+        self.previous_page.disabled = len(self.cursors) == 1
+        self.next_page.disabled = len(rows) <= self.page_size
+        if not self.rows:
+            return discord.Embed(title="Tags", description="No tags yet")
+        lines = [f"{name} ({used} uses)" if self.by_usage else name for name, used in self.rows]
+        return discord.Embed(title="Tags", description="\n".join(lines)).set_footer(
+            text=f"Page {len(self.cursors)}",
+        )
+
+    @typing.override
+    def step(self, forward: bool) -> None:
+        if forward and self.rows:
+            self.cursors.append(self.rows[-1])
+        elif not forward and len(self.cursors) > 1:
+            self.cursors.pop()
+
+    @discord.ui.button(label="Sort by usage", style=discord.ButtonStyle.primary)
+    async def sort(
+        self,
+        interaction: discord.Interaction[discord.Client],
+        button: discord.ui.Button["TagListView"],
+    ) -> None:
+        """Switch between sorting by name and by usage, starting over from the first page."""
+        self.by_usage = not self.by_usage
+        button.label = "Sort by name" if self.by_usage else "Sort by usage"
+        self.cursors = [None]
+        await interaction.response.edit_message(embed=await self.load(), view=self)
+
+
+class TagSearchView(PagedView):
+    """Paginated full-text search results over a guild's tags."""
+
+    def __init__(self, guild_id: int, tags: TagRepository, user_id: int, query: str, page_size: int = 5) -> None:
+        """Initialize the search on its first page."""
+        super().__init__(user_id)
+        self.guild_id = guild_id
+        self.tags = tags
+        self.query = query
+        self.page_size = page_size
+        self.page = 0
+
+    @typing.override
+    async def load(self) -> discord.Embed:
+        rows = await self.tags.search(
+            self.guild_id,
+            self.query,
+            self.page_size + 1,
+            self.page * self.page_size,
+        )
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = len(rows) <= self.page_size
+        embed = discord.Embed(title=f"Tags matching {self.query}"[:256], color=discord.Color(0x734EBE))
+        if not rows:
+            embed.description = "No tags found"
+            return embed
+        for name, snippet in rows[: self.page_size]:
+            embed.add_field(name=name, value=snippet[:1024] or "\u200b", inline=False)
+        return embed.set_footer(text=f"Page {self.page + 1}")
+
+    @typing.override
+    def step(self, forward: bool) -> None:
+        self.page = self.page + 1 if forward else max(self.page - 1, 0)
+
+
+class TagHistoryView(PagedView):
+    """Paginated revision history of a tag, newest first."""
+
+    def __init__(self, tag: DBTag, tags: TagRepository, user_id: int, page_size: int = 10) -> None:
+        """Initialize the history on its first page."""
+        super().__init__(user_id)
+        self.tag = tag
+        self.tags = tags
+        self.page_size = page_size
+        self.page = 0
+
+    @typing.override
+    async def load(self) -> discord.Embed:
+        rows = await self.tags.history(self.tag, self.page_size + 1, self.page * self.page_size)
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = len(rows) <= self.page_size
+        embed = discord.Embed(title=f"History of {self.tag.tagname}"[:256], color=discord.Color(0x734EBE))
+        if not rows:
+            embed.description = "No revisions recorded yet"
+            return embed
+        embed.description = "\n".join(
+            f"**#{row.revision}** <t:{int(row.created_at.timestamp())}:R>"
+            f" by {row.editor.name if row.editor else 'unknown'}"
+            f" ({'snapshot' if row.snapshot else 'edit'}, {row.size} chars)"
+            for row in rows[: self.page_size]
+        )
+        return embed.set_footer(text=f"Page {self.page + 1} | Use /tag_revert to restore a revision")
+
+    @typing.override
+    def step(self, forward: bool) -> None:
+        self.page = self.page + 1 if forward else max(self.page - 1, 0)
+
+
+EMOJI_RE = re.compile(r"<:\d+>|<:.+?:\d+>|<a:.+:\d+>|[\U00010000-\U0010ffff]")
+
+
+class RenderedTag:
+    """A tag's precomputed embed payload and link button specs."""
+
+    __slots__ = ("updated_at", "payload", "footer", "buttons")
+
+    def __init__(
+        self,
+        updated_at: datetime.datetime,
+        payload: EmbedPayload,
+        footer: str,
+        buttons: tuple[tuple[str, str, str | None], ...],
+    ) -> None:
+        """Initialize the rendered tag."""
+        self.updated_at = updated_at
+        self.payload = payload
+        self.footer = footer
+        self.buttons = buttons
+
+    @classmethod
+    def from_tag(cls, tag: DBTag) -> "RenderedTag":
+        """Render `tag`, splitting emoji from the button labels without touching its ButtonLinks."""
+        buttons = []
+        for button_link in tag.button_links:
+            label = button_link.label
+            custom_emojis = EMOJI_RE.search(label)
+            emoji = None
+            if custom_emojis is not None:
+                emoji = custom_emojis.group(0).strip()
+                label = label.replace(emoji, "").strip()
+            buttons.append((label, button_link.url, emoji))
+        return cls(
+            tag.updated_at,
+            discord.Embed(title=tag.tagname, description=tag.content, color=discord.Color(0x734EBE)).to_dict(),
+            f"Created by {tag.author.name} at {int(tag.created_at.timestamp())}"
+            f" | Last updated at {int(tag.updated_at.timestamp())}",
+            tuple(buttons),
+        )
+
+    def embed(self, used_count: int) -> discord.Embed:
+        """Build the tag embed with the current used count."""
+        return discord.Embed.from_dict(self.payload).set_footer(text=f"Used count: {used_count} | {self.footer}")
+
+    def view(self) -> discord.ui.View:
+        """Build the link button view."""
+        view = discord.ui.View()
+        for label, url, emoji in self.buttons:
+            view.add_item(discord.ui.Button(style=discord.ButtonStyle.link, label=label, url=url, emoji=emoji))
+        return view
+
+
 class Tags(BaseCog):
     """Tags cog with commands for tags."""
 
@@ -190,26 +416,47 @@ class Tags(BaseCog):
         logging.getLogger(__name__).info("Initialized %s", cls.__name__)
         await bot.add_cog(cls(bot))
 
-    def prepare_tag_view(self, button_links: list[ButtonLink]) -> discord.ui.View:
-        """Prepare the tag view."""
-        view = discord.ui.View()
-        for button_link in button_links:
-            custom_emojis = re.search(r"<:\d+>|<:.+?:\d+>|<a:.+:\d+>|[\U00010000-\U0010ffff]", button_link.label)
-            if custom_emojis is not None:
-                emoji = custom_emojis.group(0).strip()
-                button_link.label = button_link.label.replace(emoji, "")
-                button_link.label = button_link.label.strip()
-            else:
-                emoji = None
-            view.add_item(
-                discord.ui.Button(
-                    style=discord.ButtonStyle.link,
-                    label=button_link.label,
-                    url=button_link.url,
-                    emoji=emoji,
-                ),
-            )
-        return view
+    def __init__(self, bot: Bot) -> None:
+        """Initialize the cog with a cache of rendered tags."""
+        super().__init__(bot)
+        self.render_cache: LRUCache[int, RenderedTag] = LRUCache(max_entries=1024, ttl=None)
+        self.rollup_usage.start()  # pylint: disable=E1101
+        if isinstance(bot, SideBot) and bot.tag_listener is not None:
+            bot.tag_listener.subscribe(self.on_tag_event)
+
+    async def cog_unload(self) -> None:
+        """Stop rolling up usage stats and following tag changes."""
+        self.rollup_usage.cancel()  # pylint: disable=E1101
+        if isinstance(self.bot, SideBot) and self.bot.tag_listener is not None:
+            self.bot.tag_listener.unsubscribe(self.on_tag_event)
+
+    async def on_tag_event(self, event: TagEvent) -> None:
+        """Drop the rendered form of a tag changed by any process."""
+        if event.op == "RESET":
+            self.render_cache.clear()
+        elif event.table == "tags" and event.tag_id is not None:
+            self.render_cache.invalidate(event.tag_id)
+
+    @tasks.loop(minutes=10)
+    async def rollup_usage(self) -> None:
+        """Roll tag usage events up into the hourly and daily stats and prune old stats."""
+        if isinstance(self.bot, SideBot) and hasattr(self.bot, "tags"):
+            config = self.bot.config.tag_usage
+            try:
+                await self.bot.tags.rollup_usage(config.hourly_retention, config.daily_retention)
+            except Exception:
+                # Events stay in place, so the next iteration picks them up.
+                self.logger.exception("Failed to roll up tag usage")
+
+    def render_tag(self, tag: DBTag) -> RenderedTag:
+        """Get the rendered form of `tag`, rendering it again only if it changed."""
+        rendered = self.render_cache.get(tag.id) if tag.id is not None else None
+        if rendered is not None and rendered.updated_at == tag.updated_at:
+            return rendered
+        rendered = RenderedTag.from_tag(tag)
+        if tag.id is not None:
+            self.render_cache.set(tag.id, rendered)
+        return rendered
 
     @acommand()
     @guild_only()
@@ -227,29 +474,26 @@ class Tags(BaseCog):
             )
         if isinstance(ctx.client, SideBot):
             try:
-                tag = await DBTag.get(
-                    ctx.guild.id,
-                    tag_name,
-                    ctx.client.connection,
-                )
+                tag = await ctx.client.tags.get(ctx.guild.id, tag_name, user_id=ctx.user.id)
             except ValueError:
+                description = "Tag not found"
+                suggestions = name_index.suggest(ctx.guild.id, tag_name)
+                if suggestions:
+                    description += "\nDid you mean: " + ", ".join(f"`{name}`" for name in suggestions) + "?"
                 return await ctx.response.send_message(
                     embeds=[
                         discord.Embed(
                             title="404 Not Found",
-                            description="Tag not found",
+                            description=description,
                         ),
                     ],
                     ephemeral=True,
                 )
-            embed = discord.Embed(title=tag_name, description=tag.content, color=discord.Color(0x734EBE)).set_footer(
-                text=f"Used count: {tag.used_count} | Created by {tag.author.name}"
-                f" at {int(tag.created_at.timestamp())} | Last updated at {int(tag.updated_at.timestamp())}",
-            )
+            rendered = self.render_tag(tag)
             return await ctx.response.send_message(
-                embeds=[embed],
+                embeds=[rendered.embed(tag.used_count)],
                 ephemeral=False,
-                view=(self.prepare_tag_view(tag.button_links) if tag.button_links else discord.utils.MISSING),
+                view=rendered.view() if rendered.buttons else discord.utils.MISSING,
             )
 
         return await ctx.response.send_message(
@@ -311,8 +555,28 @@ class Tags(BaseCog):
                 ephemeral=True,
             )
         if isinstance(ctx.client, SideBot):
-            tag = await DBTag.get(ctx.guild.id, tag_name, ctx.client.connection)
-            await tag.delete()
+            try:
+                # Only the tag's own name, deleting it through an alias would take every alias with it.
+                tag = await ctx.client.tags.get(ctx.guild.id, tag_name, count=False, aliases=False)
+            except ValueError:
+                target = name_index.resolve(ctx.guild.id, tag_name)
+                if target != tag_name:
+                    return await ctx.response.send_message(
+                        embeds=[
+                            discord.Embed(
+                                title="400 Bad Request",
+                                description=f"`{tag_name}` is an alias of `{target}`, use /tag_unalias to remove it.",
+                            ),
+                        ],
+                        ephemeral=True,
+                    )
+                return await ctx.response.send_message(
+                    embeds=[discord.Embed(title="404 Not Found", description="Tag not found")],
+                    ephemeral=True,
+                )
+            await ctx.client.tags.delete(tag)
+            if tag.id is not None:
+                self.render_cache.invalidate(tag.id)
             return await ctx.response.send_message(
                 embeds=[
                     discord.Embed(title="200 OK", description="Tag deleted"),
@@ -363,7 +627,8 @@ class Tags(BaseCog):
 
     @acommand()
     @guild_only()
-    async def tags(self, ctx: discord.Interaction) -> None:
+    @app_commands.describe(by_usage="Sort the tags by how often they are used")
+    async def tags(self, ctx: discord.Interaction, by_usage: bool = False) -> None:  # noqa: FBT001, FBT002
         """Get all tags."""
         if not ctx.guild:
             return await ctx.response.send_message(
@@ -376,14 +641,84 @@ class Tags(BaseCog):
                 ephemeral=True,
             )
         if isinstance(ctx.client, SideBot):
-            tags = DBTag.get_all(ctx.guild.id, ctx.client.connection)
+            view = TagListView(ctx.guild.id, ctx.client.tags, ctx.user.id, by_usage=by_usage)
+            return await ctx.response.send_message(
+                embeds=[await view.load()],
+                view=view,
+                ephemeral=True,
+            )
+
+        return await ctx.response.send_message(
+            embeds=[
+                discord.Embed(
+                    title="501 Not Implemented",
+                    description="Contact <@195864152856723456> if this happens :)",
+                ),
+            ],
+            ephemeral=True,
+        )
+
+    @acommand()
+    @guild_only()
+    @app_commands.describe(query="Words to look for in tag names and content")
+    async def tag_search(self, ctx: discord.Interaction, query: str) -> None:
+        """Search tags by their content."""
+        if not ctx.guild:
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(
+                        title="400 Bad Request",
+                        description="This command can only be used in a guild.",
+                    ),
+                ],
+                ephemeral=True,
+            )
+        if isinstance(ctx.client, SideBot):
+            view = TagSearchView(ctx.guild.id, ctx.client.tags, ctx.user.id, query)
+            return await ctx.response.send_message(
+                embeds=[await view.load()],
+                view=view,
+                ephemeral=True,
+            )
+
+        return await ctx.response.send_message(
+            embeds=[
+                discord.Embed(
+                    title="501 Not Implemented",
+                    description="Contact <@195864152856723456> if this happens :)",
+                ),
+            ],
+            ephemeral=True,
+        )
+
+    @acommand()
+    @guild_only()
+    @app_commands.describe(window="How far back to look")
+    async def tag_stats(
+        self,
+        ctx: discord.Interaction,
+        window: typing.Literal["24h", "7d", "30d", "365d"] = "7d",
+    ) -> None:
+        """Show the most used tags over a time window."""
+        if not ctx.guild:
             return await ctx.response.send_message(
                 embeds=[
                     discord.Embed(
-                        title="Tags",
-                        description="\n".join(
-                            [tag.tagname async for tag in tags],
-                        ),
+                        title="400 Bad Request",
+                        description="This command can only be used in a guild.",
+                    ),
+                ],
+                ephemeral=True,
+            )
+        if isinstance(ctx.client, SideBot):
+            rows = await ctx.client.tags.top_tags(ctx.guild.id, int(window[:-1]) if window[-1] == "d" else 1)
+            lines = [f"{i}. {name} ({uses} uses)" for i, (name, uses) in enumerate(rows, 1)]
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(
+                        title=f"Top tags over the last {window}",
+                        description="\n".join(lines) or "No tags used yet",
+                        color=discord.Color(0x734EBE),
                     ),
                 ],
                 ephemeral=True,
@@ -414,10 +749,13 @@ class Tags(BaseCog):
                 ephemeral=True,
             )
         if isinstance(ctx.client, SideBot):
-            tag = await DBTag.get(ctx.guild.id, tag_name, ctx.client.connection)
-            button_link = ButtonLink(title, url)
-            tag.button_links.append(button_link)
-            await tag.save()
+            tag = await ctx.client.tags.get(ctx.guild.id, tag_name, count=False)
+            await ctx.client.tags.save(
+                tag.replace(button_links=(*tag.button_links, ButtonLink(title, url))),
+                DiscordUser.from_dpy_user(ctx.user),
+            )
+            if tag.id is not None:
+                self.render_cache.invalidate(tag.id)
             return await ctx.response.send_message(
                 embeds=[
                     discord.Embed(title="200 OK", description="Button link added"),
@@ -451,9 +789,15 @@ class Tags(BaseCog):
                 ephemeral=True,
             )
         if isinstance(ctx.client, SideBot):
-            tag = await DBTag.get(ctx.guild.id, tag_name, ctx.client.connection)
-            del tag.button_links[idx - 1]
-            await tag.save()
+            tag = await ctx.client.tags.get(ctx.guild.id, tag_name, count=False)
+            button_links = list(tag.button_links)
+            del button_links[idx - 1]
+            await ctx.client.tags.save(
+                tag.replace(button_links=tuple(button_links)),
+                DiscordUser.from_dpy_user(ctx.user),
+            )
+            if tag.id is not None:
+                self.render_cache.invalidate(tag.id)
             return await ctx.response.send_message(
                 embeds=[
                     discord.Embed(title="200 OK", description="Button link removed"),
@@ -471,5 +815,314 @@ class Tags(BaseCog):
             ephemeral=True,
         )
 
+    @acommand()
+    @guild_only()
+    @app_commands.default_permissions(manage_expressions=True)
+    @app_commands.describe(tag_name="The tag to alias", alias="Another name the tag can be used by")
+    async def tag_alias(self, ctx: discord.Interaction, tag_name: str, alias: app_commands.Range[str, 1, 30]) -> None:
+        """Add an alias to a tag."""
+        if not ctx.guild:
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(
+                        title="400 Bad Request",
+                        description="This command can only be used in a guild.",
+                    ),
+                ],
+                ephemeral=True,
+            )
+        if isinstance(ctx.client, SideBot):
+            try:
+                tag = await ctx.client.tags.get(ctx.guild.id, tag_name, count=False)
+            except ValueError:
+                return await ctx.response.send_message(
+                    embeds=[discord.Embed(title="404 Not Found", description="Tag not found")],
+                    ephemeral=True,
+                )
+            if not await ctx.client.tags.add_alias(tag, alias):
+                return await ctx.response.send_message(
+                    embeds=[
+                        discord.Embed(
+                            title="409 Conflict", description=f"A tag or alias named `{alias}` already exists"
+                        ),
+                    ],
+                    ephemeral=True,
+                )
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(title="201 Created", description=f"`{alias}` is now an alias of `{tag.tagname}`"),
+                ],
+                ephemeral=True,
+            )
+
+        return await ctx.response.send_message(
+            embeds=[
+                discord.Embed(
+                    title="501 Not Implemented",
+                    description="Contact <@195864152856723456> if this happens :)",
+                ),
+            ],
+            ephemeral=True,
+        )
+
+    @acommand()
+    @guild_only()
+    @app_commands.default_permissions(manage_expressions=True)
+    async def tag_unalias(self, ctx: discord.Interaction, alias: str) -> None:
+        """Remove an alias from a tag."""
+        if not ctx.guild:
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(
+                        title="400 Bad Request",
+                        description="This command can only be used in a guild.",
+                    ),
+                ],
+                ephemeral=True,
+            )
+        if isinstance(ctx.client, SideBot):
+            if not await ctx.client.tags.remove_alias(ctx.guild.id, alias):
+                return await ctx.response.send_message(
+                    embeds=[discord.Embed(title="404 Not Found", description="Alias not found")],
+                    ephemeral=True,
+                )
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(title="200 OK", description="Alias removed"),
+                ],
+                ephemeral=True,
+            )
+
+        return await ctx.response.send_message(
+            embeds=[
+                discord.Embed(
+                    title="501 Not Implemented",
+                    description="Contact <@195864152856723456> if this happens :)",
+                ),
+            ],
+            ephemeral=True,
+        )
+
+    @acommand()
+    @guild_only()
+    async def tag_history(self, ctx: discord.Interaction, tag_name: str) -> None:
+        """Show the revision history of a tag."""
+        if not ctx.guild:
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(
+                        title="400 Bad Request",
+                        description="This command can only be used in a guild.",
+                    ),
+                ],
+                ephemeral=True,
+            )
+        if isinstance(ctx.client, SideBot):
+            try:
+                tag = await ctx.client.tags.get(ctx.guild.id, tag_name, count=False, readonly=True)
+            except ValueError:
+                return await ctx.response.send_message(
+                    embeds=[discord.Embed(title="404 Not Found", description="Tag not found")],
+                    ephemeral=True,
+                )
+            view = TagHistoryView(tag, ctx.client.tags, ctx.user.id)
+            return await ctx.response.send_message(
+                embeds=[await view.load()],
+                view=view,
+                ephemeral=True,
+            )
+
+        return await ctx.response.send_message(
+            embeds=[
+                discord.Embed(
+                    title="501 Not Implemented",
+                    description="Contact <@195864152856723456> if this happens :)",
+                ),
+            ],
+            ephemeral=True,
+        )
+
+    @acommand()
+    @guild_only()
+    @app_commands.default_permissions(manage_expressions=True)
+    @app_commands.describe(revision="The revision number from /tag_history")
+    async def tag_revert(self, ctx: discord.Interaction, tag_name: str, revision: int) -> None:
+        """Restore a tag to an earlier revision."""
+        if not ctx.guild:
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(
+                        title="400 Bad Request",
+                        description="This command can only be used in a guild.",
+                    ),
+                ],
+                ephemeral=True,
+            )
+        if isinstance(ctx.client, SideBot):
+            try:
+                tag = await ctx.client.tags.get(ctx.guild.id, tag_name, count=False)
+            except ValueError:
+                return await ctx.response.send_message(
+                    embeds=[discord.Embed(title="404 Not Found", description="Tag not found")],
+                    ephemeral=True,
+                )
+            reverted = await ctx.client.tags.revert(tag, revision, DiscordUser.from_dpy_user(ctx.user))
+            if reverted is None:
+                return await ctx.response.send_message(
+                    embeds=[discord.Embed(title="404 Not Found", description=f"Revision {revision} not found")],
+                    ephemeral=True,
+                )
+            if tag.id is not None:
+                self.render_cache.invalidate(tag.id)
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(title="200 OK", description=f"Tag reverted to revision {revision}"),
+                ],
+                ephemeral=True,
+            )
+
+        return await ctx.response.send_message(
+            embeds=[
+                discord.Embed(
+                    title="501 Not Implemented",
+                    description="Contact <@195864152856723456> if this happens :)",
+                ),
+            ],
+            ephemeral=True,
+        )
+
+    @acommand()
+    @guild_only()
+    @app_commands.describe(fmt="The file format to export as")
+    async def tag_export(self, ctx: discord.Interaction, fmt: typing.Literal["jsonl", "csv"] = "jsonl") -> None:
+        """Export every tag of this guild to a file."""
+        if not ctx.guild:
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(
+                        title="400 Bad Request",
+                        description="This command can only be used in a guild.",
+                    ),
+                ],
+                ephemeral=True,
+            )
+        if isinstance(ctx.client, SideBot):
+            if ctx.client.owner_id != ctx.user.id:
+                return await ctx.response.send_message(
+                    embeds=[
+                        discord.Embed(title="403 Forbidden", description="Only the bot owner can export tags."),
+                    ],
+                    ephemeral=True,
+                )
+            await ctx.response.defer(ephemeral=True, thinking=True)
+            # Spill to disk so large exports don't sit in memory.
+            with tempfile.TemporaryFile() as out:
+                await export_tags(ctx.client.pool, out, fmt, ctx.guild.id)
+                out.seek(0)
+                await ctx.followup.send(
+                    file=discord.File(out, filename=f"tags-{ctx.guild.id}.{fmt}"),
+                    ephemeral=True,
+                )
+            return None
+
+        return await ctx.response.send_message(
+            embeds=[
+                discord.Embed(
+                    title="501 Not Implemented",
+                    description="Contact <@195864152856723456> if this happens :)",
+                ),
+            ],
+            ephemeral=True,
+        )
+
+    @acommand()
+    @guild_only()
+    @app_commands.describe(file="A .jsonl or .csv file from /tag_export")
+    async def tag_import(self, ctx: discord.Interaction, file: discord.Attachment) -> None:
+        """Import tags into this guild from a file, replacing tags with the same name."""
+        if not ctx.guild:
+            return await ctx.response.send_message(
+                embeds=[
+                    discord.Embed(
+                        title="400 Bad Request",
+                        description="This command can only be used in a guild.",
+                    ),
+                ],
+                ephemeral=True,
+            )
+        if isinstance(ctx.client, SideBot):
+            if ctx.client.owner_id != ctx.user.id:
+                return await ctx.response.send_message(
+                    embeds=[
+                        discord.Embed(title="403 Forbidden", description="Only the bot owner can import tags."),
+                    ],
+                    ephemeral=True,
+                )
+            await ctx.response.defer(ephemeral=True, thinking=True)
+            with tempfile.TemporaryFile() as src:
+                await file.save(src)
+                src.seek(0)
+                count = await import_tags(
+                    ctx.client.pool,
+                    src,
+                    "csv" if file.filename.endswith(".csv") else "jsonl",
+                    ctx.guild.id,
+                )
+            await ctx.followup.send(
+                embeds=[discord.Embed(title="200 OK", description=f"Imported {count} tags")],
+                ephemeral=True,
+            )
+            return None
+
+        return await ctx.response.send_message(
+            embeds=[
+                discord.Embed(
+                    title="501 Not Implemented",
+                    description="Contact <@195864152856723456> if this happens :)",
+                ),
+            ],
+            ephemeral=True,
+        )
+
+    @tag.autocomplete("tag_name")
+    @add_button_link.autocomplete("tag_name")
+    @remove_button_link.autocomplete("tag_name")
+    @tag_alias.autocomplete("tag_name")
+    @tag_history.autocomplete("tag_name")
+    @tag_revert.autocomplete("tag_name")
+    async def tag_name_autocomplete(
+        self,
+        ctx: discord.Interaction,
+        current: str,
+    ) -> list[app_commands.Choice[str]]:
+        """Autocomplete tag names from the in-memory index, without touching the database."""
+        if not ctx.guild:
+            return []
+        return [app_commands.Choice(name=name, value=name) for name in name_index.prefix(ctx.guild.id, current)]
+
+    @delete.autocomplete("tag_name")
+    async def tag_only_autocomplete(
+        self,
+        ctx: discord.Interaction,
+        current: str,
+    ) -> list[app_commands.Choice[str]]:
+        """Autocomplete tag names without aliases from the in-memory index."""
+        if not ctx.guild:
+            return []
+        return [app_commands.Choice(name=name, value=name) for name in name_index.prefix_tags(ctx.guild.id, current)]
+
+    @tag_unalias.autocomplete("alias")
+    async def tag_alias_autocomplete(
+        self,
+        ctx: discord.Interaction,
+        current: str,
+    ) -> list[app_commands.Choice[str]]:
+        """Autocomplete aliases from the in-memory index."""
+        if not ctx.guild:
+            return []
+        return [
+            app_commands.Choice(name=alias, value=alias) for alias in name_index.prefix_aliases(ctx.guild.id, current)
+        ]
+
 
 setup = Tags.setup
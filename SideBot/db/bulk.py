@@ -0,0 +1,146 @@
+"""Bulk tag import/export module using the COPY protocol."""
+
+import csv
+import datetime
+import io
+import json
+from collections.abc import AsyncIterator, Iterable, Iterator
+from typing import Any, BinaryIO, Literal
+
+from SideBot.db.pool import DBPool
+from SideBot.db.tags import TagRepository, tag_cache
+from SideBot.utils import ButtonLink, DiscordUser
+
+Format = Literal["jsonl", "csv"]
+
+COLUMNS = ["guild_id", "name", "content", "author", "button_links", "used", "created_at", "updated_at"]
+
+EXPORT_CSV = """SELECT guild_id, name, content, (author).id AS author_id, (author).name AS author_name,
+COALESCE(to_json(button_links), '[]'::json) AS button_links, used, created_at, updated_at
+FROM tags WHERE $1::bigint IS NULL OR guild_id = $1 ORDER BY guild_id, name"""
+
+EXPORT_JSONL = """SELECT json_build_object(
+    'guild_id', guild_id,
+    'name', name,
+    'content', content,
+    'author', json_build_object('id', (author).id, 'name', (author).name),
+    'button_links', COALESCE(to_json(button_links), '[]'::json),
+    'used', used,
+    'created_at', created_at,
+    'updated_at', updated_at
+) FROM tags WHERE $1::bigint IS NULL OR guild_id = $1 ORDER BY guild_id, name"""
+
+IMPORT_TABLE = """CREATE TEMP TABLE tags_import (
+    guild_id BIGINT,
+    name TEXT,
+    content TEXT,
+    author discorduser,
+    button_links buttonlink[],
+    used BIGINT,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+) ON COMMIT DROP"""
+
+# There is no unique constraint on (guild_id, name), so the upsert is an
+# UPDATE of existing tags followed by an INSERT of the rest, under a lock
+# that keeps other writers from adding the same names in between.
+IMPORT_UPSERT = [
+    "LOCK TABLE tags IN SHARE ROW EXCLUSIVE MODE",
+    """UPDATE tags SET content = i.content, author = i.author, button_links = i.button_links,
+    used = COALESCE(i.used, tags.used), updated_at = COALESCE(i.updated_at, NOW())
+    FROM (SELECT DISTINCT ON (guild_id, name) * FROM tags_import ORDER BY guild_id, name) i
+    WHERE tags.guild_id = i.guild_id AND tags.name = i.name""",
+    """INSERT INTO tags (guild_id, name, content, author, button_links, used, created_at, updated_at)
+    SELECT DISTINCT ON (guild_id, name) guild_id, name, content, author, button_links,
+    COALESCE(used, 0), COALESCE(created_at, NOW()), COALESCE(updated_at, NOW())
+    FROM tags_import i
+    WHERE NOT EXISTS (SELECT 1 FROM tags t WHERE t.guild_id = i.guild_id AND t.name = i.name)
+    ORDER BY guild_id, name""",
+]
+
+
+def _timestamp(value: str | None) -> datetime.datetime | None:
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def _button_links(value: Any) -> list[ButtonLink]:
+    links: list[dict[str, str]] = json.loads(value) if isinstance(value, str) else value or []
+    return [ButtonLink(link["label"], link["url"]) for link in links]
+
+
+def _parse_jsonl(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    for line in lines:
+        if line.strip():
+            tag = json.loads(line)
+            tag["author_id"] = tag["author"]["id"]
+            tag["author_name"] = tag["author"]["name"]
+            yield tag
+
+
+def _parse_csv(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    yield from csv.DictReader(lines)
+
+
+def _records(
+    lines: Iterable[str],
+    fmt: Format,
+    guild_id: int | None,
+) -> Iterator[tuple[Any, ...]]:
+    rows = _parse_jsonl(lines) if fmt == "jsonl" else _parse_csv(lines)
+    for row in rows:
+        yield (
+            guild_id if guild_id is not None else int(row["guild_id"]),
+            row["name"],
+            row["content"],
+            DiscordUser(int(row["author_id"]), row["author_name"]),
+            _button_links(row.get("button_links")),
+            int(row["used"]) if row.get("used") not in (None, "") else None,
+            _timestamp(row.get("created_at")),
+            _timestamp(row.get("updated_at")),
+        )
+
+
+async def _aiter(records: Iterator[tuple[Any, ...]]) -> AsyncIterator[tuple[Any, ...]]:
+    for record in records:
+        yield record
+
+
+async def export_tags(pool: DBPool, output: BinaryIO, fmt: Format = "jsonl", guild_id: int | None = None) -> None:
+    """Stream the tags of `guild_id` (or every guild) to the binary file `output`."""
+    async with pool.acquire(readonly=True) as conn:
+        if fmt == "csv":
+            await conn.copy_from_query(EXPORT_CSV, guild_id, output=output, format="csv", header=True)
+            return
+        # A single JSON column never contains raw control characters, so a CSV
+        # COPY with control characters as delimiter and quote writes it verbatim.
+        await conn.copy_from_query(
+            EXPORT_JSONL,
+            guild_id,
+            output=output,
+            format="csv",
+            delimiter="\x1f",
+            quote="\x1e",
+        )
+
+
+async def import_tags(pool: DBPool, source: BinaryIO, fmt: Format = "jsonl", guild_id: int | None = None) -> int:
+    """Upsert the tags in the binary file `source`, into `guild_id` if given, in one transaction.
+
+    Returns the amount of imported rows.
+    """
+    lines = io.TextIOWrapper(source, encoding="utf-8", newline="")
+    try:
+        async with pool.acquire() as conn, conn.transaction():
+            await conn.execute(IMPORT_TABLE)
+            result = await conn.copy_records_to_table(
+                "tags_import",
+                records=_aiter(_records(lines, fmt, guild_id)),
+                columns=COLUMNS,
+            )
+            for statement in IMPORT_UPSERT:
+                await conn.execute(statement)
+    finally:
+        lines.detach()
+    tag_cache.clear()
+    await TagRepository(pool).load_index()
+    return int(result.split()[-1])
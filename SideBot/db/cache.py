@@ -0,0 +1,94 @@
+"""In-process caches for database rows."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """A bounded least-recently-used cache with per-entry expiry."""
+
+    __slots__ = ("max_entries", "ttl", "hits", "misses", "evictions", "_entries")
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = 300.0) -> None:
+        """Initialize the cache with `max_entries` and a `ttl` in seconds (`None` never expires)."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the amount of cached entries."""
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        """Return the cache representation."""
+        return (
+            f"LRUCache(entries={len(self)}, max_entries={self.max_entries}, ttl={self.ttl}, "
+            f"hits={self.hits}, misses={self.misses}, evictions={self.evictions})"
+        )
+
+    def get(self, key: K) -> V | None:
+        """Get the value for `key`, otherwise returns None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        """Set the value for `key`, evicting the least recently used entries if full."""
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def replace(self, key: K, value: V) -> None:
+        """Replace the value of `key` if it is cached, keeping its expiry."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = (entry[0], value)
+
+    def invalidate(self, key: K) -> None:
+        """Drop `key` from the cache if present."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry from the cache."""
+        self._entries.clear()
+
+    def configure(self, max_entries: int, ttl: float | None) -> None:
+        """Change the size and expiry of the cache, dropping entries that no longer fit."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        while len(self._entries) > max(max_entries, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the hit, miss and eviction counters."""
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,240 @@
+"""In-memory tag name indexes."""
+
+import bisect
+import heapq
+import itertools
+from collections.abc import Iterable, Iterator
+
+
+def trigrams(name: str) -> set[str]:
+    """Return the trigrams of `name`, padded like pg_trgm."""
+    padded = f"  {name.casefold()} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class _GuildNames:
+    """The sorted names, trigram postings and aliases of a single guild."""
+
+    __slots__ = ("names", "postings", "sizes", "aliases", "ids")
+
+    def __init__(self) -> None:
+        """Initialize an empty guild index."""
+        # (casefolded name, name) pairs kept sorted for bisection.
+        self.names: list[tuple[str, str]] = []
+        # trigram -> names containing it, and name -> amount of trigrams.
+        self.postings: dict[str, set[str]] = {}
+        self.sizes: dict[str, int] = {}
+        # alias -> tag name, aliases are indexed alongside the names.
+        self.aliases: dict[str, str] = {}
+        # tag name -> tag id.
+        self.ids: dict[str, int] = {}
+
+    def add_trigrams(self, name: str) -> None:
+        """Index the trigrams of `name`."""
+        grams = trigrams(name)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(name)
+        self.sizes[name] = len(grams)
+
+    def remove_trigrams(self, name: str) -> None:
+        """Drop the trigrams of `name` from the postings."""
+        for gram in trigrams(name):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(name)
+                if not posting:
+                    del self.postings[gram]
+        self.sizes.pop(name, None)
+
+    def starting_with(self, prefix: str) -> Iterator[str]:
+        """Yield the names starting with `prefix` in order, ignoring case."""
+        folded = prefix.casefold()
+        for i in range(bisect.bisect_left(self.names, (folded,)), len(self.names)):
+            key, name = self.names[i]
+            if not key.startswith(folded):
+                return
+            yield name
+
+    def insert(self, name: str) -> None:
+        """Insert `name` into the sorted names and postings if missing."""
+        entry = (name.casefold(), name)
+        i = bisect.bisect_left(self.names, entry)
+        if i == len(self.names) or self.names[i] != entry:
+            self.names.insert(i, entry)
+            self.add_trigrams(name)
+
+    def discard(self, name: str) -> None:
+        """Drop `name` from the sorted names and postings if present."""
+        entry = (name.casefold(), name)
+        i = bisect.bisect_left(self.names, entry)
+        if i < len(self.names) and self.names[i] == entry:
+            del self.names[i]
+            self.remove_trigrams(name)
+
+
+class TagNameIndex:
+    """Per-guild index of tag names and aliases for prefix, fuzzy and alias lookups.
+
+    Tag names take precedence over aliases with the same name.
+    """
+
+    __slots__ = ("_guilds", "_ids")
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._guilds: dict[int, _GuildNames] = {}
+        # tag id -> (guild_id, name), to follow renames and deletions by id.
+        self._ids: dict[int, tuple[int, str]] = {}
+
+    def __len__(self) -> int:
+        """Return the amount of indexed names across every guild."""
+        return sum(len(guild.names) for guild in self._guilds.values())
+
+    def __repr__(self) -> str:
+        """Return the index representation."""
+        return f"TagNameIndex(guilds={len(self._guilds)}, names={len(self)})"
+
+    def load(
+        self,
+        rows: Iterable[tuple[int, int, str]],
+        aliases: Iterable[tuple[int, str, str]] = (),
+    ) -> None:
+        """Replace the index with the given (guild_id, tag_id, name) and (guild_id, alias, name) rows."""
+        guilds: dict[int, _GuildNames] = {}
+        ids: dict[int, tuple[int, str]] = {}
+        for guild_id, tag_id, name in rows:
+            guild = guilds.get(guild_id)
+            if guild is None:
+                guild = guilds[guild_id] = _GuildNames()
+            if name not in guild.sizes:
+                guild.names.append((name.casefold(), name))
+                guild.add_trigrams(name)
+            guild.ids[name] = tag_id
+            ids[tag_id] = (guild_id, name)
+        for guild_id, alias, name in aliases:
+            guild = guilds.get(guild_id)
+            if guild is None or alias in guild.sizes:
+                continue
+            guild.names.append((alias.casefold(), alias))
+            guild.add_trigrams(alias)
+            guild.aliases[alias] = name
+        for guild in guilds.values():
+            guild.names.sort()
+        self._guilds = guilds
+        self._ids = ids
+
+    def tag_ids(self) -> set[int]:
+        """Return the ids of every indexed tag."""
+        return set(self._ids)
+
+    def tags(self) -> Iterator[tuple[int, int, str]]:
+        """Yield the (guild_id, tag_id, name) of every indexed tag."""
+        for tag_id, (guild_id, name) in self._ids.items():
+            yield guild_id, tag_id, name
+
+    def aliases(self) -> Iterator[tuple[int, str, str]]:
+        """Yield the (guild_id, alias, name) of every indexed alias."""
+        for guild_id, guild in self._guilds.items():
+            for alias, name in guild.aliases.items():
+                yield guild_id, alias, name
+
+    def add(self, guild_id: int, tag_id: int, name: str) -> None:
+        """Add the tag `tag_id` named `name` to the guild's index, replacing its previous name."""
+        previous = self._ids.get(tag_id)
+        if previous is not None and previous != (guild_id, name):
+            self.remove(*previous)
+        self._ids[tag_id] = (guild_id, name)
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = self._guilds[guild_id] = _GuildNames()
+        guild.ids[name] = tag_id
+        guild.aliases.pop(name, None)
+        guild.insert(name)
+
+    def remove(self, guild_id: int, name: str) -> None:
+        """Remove `name` and its aliases from the guild's index if present."""
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return
+        tag_id = guild.ids.pop(name, None)
+        if tag_id is not None:
+            self._ids.pop(tag_id, None)
+        guild.discard(name)
+        for alias in [alias for alias, target in guild.aliases.items() if target == name]:
+            del guild.aliases[alias]
+            guild.discard(alias)
+
+    def remove_id(self, tag_id: int) -> None:
+        """Remove the tag `tag_id` and its aliases from the index if present."""
+        entry = self._ids.get(tag_id)
+        if entry is not None:
+            self.remove(*entry)
+
+    def set_aliases(self, aliases: Iterable[tuple[int, str, str]]) -> None:
+        """Replace every alias with the given (guild_id, alias, name) rows."""
+        for guild in self._guilds.values():
+            for alias in guild.aliases:
+                guild.discard(alias)
+            guild.aliases.clear()
+        for guild_id, alias, name in aliases:
+            target = self._guilds.get(guild_id)
+            if target is not None and alias not in target.ids:
+                self.add_alias(guild_id, alias, name)
+
+    def add_alias(self, guild_id: int, alias: str, name: str) -> None:
+        """Add `alias` for the tag `name` to the guild's index."""
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = self._guilds[guild_id] = _GuildNames()
+        guild.aliases[alias] = name
+        guild.insert(alias)
+
+    def remove_alias(self, guild_id: int, alias: str) -> None:
+        """Remove `alias` from the guild's index if present."""
+        guild = self._guilds.get(guild_id)
+        if guild is not None and guild.aliases.pop(alias, None) is not None:
+            guild.discard(alias)
+
+    def resolve(self, guild_id: int, name: str) -> str:
+        """Return the tag name `name` is an alias of, or `name` itself."""
+        guild = self._guilds.get(guild_id)
+        return guild.aliases.get(name, name) if guild is not None else name
+
+    def prefix(self, guild_id: int, prefix: str, limit: int = 25) -> list[str]:
+        """Return up to `limit` names in the guild starting with `prefix`, ignoring case."""
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return []
+        return list(itertools.islice(guild.starting_with(prefix), limit))
+
+    def prefix_tags(self, guild_id: int, prefix: str, limit: int = 25) -> list[str]:
+        """Return up to `limit` tag names in the guild starting with `prefix`, ignoring case, without aliases."""
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return []
+        return list(
+            itertools.islice((name for name in guild.starting_with(prefix) if name not in guild.aliases), limit),
+        )
+
+    def prefix_aliases(self, guild_id: int, prefix: str, limit: int = 25) -> list[str]:
+        """Return up to `limit` aliases in the guild starting with `prefix`, ignoring case."""
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return []
+        return list(itertools.islice((name for name in guild.starting_with(prefix) if name in guild.aliases), limit))
+
+    def suggest(self, guild_id: int, name: str, limit: int = 3, threshold: float = 0.3) -> list[str]:
+        """Return up to `limit` names in the guild most similar to `name` by trigram similarity."""
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            return []
+        grams = trigrams(name)
+        # Only names sharing at least one trigram are ever looked at.
+        shared: dict[str, int] = {}
+        for gram in grams:
+            for candidate in guild.postings.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        scored = (
+            (common / (len(grams) + guild.sizes[candidate] - common), candidate) for candidate, common in shared.items()
+        )
+        return [candidate for score, candidate in heapq.nlargest(limit, scored) if score >= threshold]
@@ -0,0 +1,232 @@
+"""Versioned schema migrations module."""
+
+import logging
+
+import asyncpg
+
+# Arbitrary key for the advisory lock held while migrating, so that several
+# SideBot processes starting at once apply each migration exactly once.
+MIGRATION_LOCK = 0x5349_4445_424F_54
+
+# (version, description, statements), applied in order. Never edit a released
+# migration, append a new one instead. Statements should be idempotent so
+# databases created before versioning existed are adopted cleanly.
+MIGRATIONS: list[tuple[int, str, list[str]]] = [
+    (
+        1,
+        "create tags",
+        [
+            """
+            DO $$ BEGIN
+                IF to_regtype('public.discorduser') IS NULL THEN
+                    CREATE TYPE public.discorduser AS (
+                        id BIGINT,
+                        name TEXT
+                    );
+                END IF;
+                IF to_regtype('public.buttonlink') IS NULL THEN
+                    CREATE TYPE public.buttonlink AS (
+                        label TEXT,
+                        url TEXT
+                    );
+                END IF;
+            END $$
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS tags (
+                guild_id BIGINT,
+                id SERIAL PRIMARY KEY NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                content TEXT NOT NULL,
+                author discorduser NOT NULL,
+                created_at TIMESTAMP DEFAULT NOW(),
+                updated_at TIMESTAMP DEFAULT NOW(),
+                button_links buttonlink[],
+                used BIGINT DEFAULT 0
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS tags_guild_id_idx ON tags (guild_id, name)",
+        ],
+    ),
+    (
+        2,
+        "index tags by usage",
+        [
+            "CREATE INDEX IF NOT EXISTS tags_guild_id_used_idx ON tags (guild_id, used, name)",
+        ],
+    ),
+    (
+        3,
+        "full-text search over tags",
+        [
+            """
+            ALTER TABLE tags ADD COLUMN IF NOT EXISTS search tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', name), 'A') || setweight(to_tsvector('english', content), 'B')
+            ) STORED
+            """,
+            "CREATE INDEX IF NOT EXISTS tags_search_idx ON tags USING GIN (search)",
+        ],
+    ),
+    (
+        4,
+        "tag aliases",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS tag_aliases (
+                guild_id BIGINT NOT NULL,
+                alias TEXT NOT NULL,
+                tag_id INT NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+                PRIMARY KEY (guild_id, alias)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS tag_aliases_tag_id_idx ON tag_aliases (tag_id)",
+        ],
+    ),
+    (
+        5,
+        "tag usage events and rollups",
+        [
+            # No foreign keys, so a batch never fails because a tag was just
+            # deleted. Stats join tags and pruning drops the leftovers.
+            """
+            CREATE TABLE IF NOT EXISTS tag_usage_events (
+                guild_id BIGINT NOT NULL,
+                tag_id INT NOT NULL,
+                user_id BIGINT NOT NULL,
+                bucket TIMESTAMPTZ NOT NULL,
+                count INT NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS tag_usage_events_bucket_idx ON tag_usage_events (bucket)",
+            """
+            CREATE TABLE IF NOT EXISTS tag_usage_hourly (
+                guild_id BIGINT NOT NULL,
+                tag_id INT NOT NULL,
+                bucket TIMESTAMPTZ NOT NULL,
+                uses BIGINT NOT NULL,
+                users INT NOT NULL,
+                PRIMARY KEY (guild_id, tag_id, bucket)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS tag_usage_hourly_guild_bucket_idx ON tag_usage_hourly (guild_id, bucket)",
+            """
+            CREATE TABLE IF NOT EXISTS tag_usage_daily (
+                guild_id BIGINT NOT NULL,
+                tag_id INT NOT NULL,
+                day DATE NOT NULL,
+                uses BIGINT NOT NULL,
+                PRIMARY KEY (guild_id, tag_id, day)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS tag_usage_daily_guild_day_idx ON tag_usage_daily (guild_id, day)",
+        ],
+    ),
+    (
+        6,
+        "notify tag changes",
+        [
+            # The channel must match SideBot.db.notify.CHANNEL.
+            """
+            CREATE OR REPLACE FUNCTION notify_tag_change() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE'
+                    AND (OLD.guild_id, OLD.name, OLD.content, OLD.author, OLD.button_links, OLD.updated_at)
+                    IS NOT DISTINCT FROM
+                    (NEW.guild_id, NEW.name, NEW.content, NEW.author, NEW.button_links, NEW.updated_at)
+                THEN
+                    -- Only the used count changed, which nothing caches.
+                    RETURN NULL;
+                END IF;
+                PERFORM pg_notify('sidebot_tags', json_build_object(
+                    'table', 'tags',
+                    'op', TG_OP,
+                    'guild_id', COALESCE(NEW.guild_id, OLD.guild_id),
+                    'tag_id', COALESCE(NEW.id, OLD.id),
+                    'name', COALESCE(NEW.name, OLD.name),
+                    'old_name', OLD.name
+                )::text);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            """
+            CREATE OR REPLACE FUNCTION notify_tag_alias_change() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('sidebot_tags', json_build_object(
+                    'table', 'tag_aliases',
+                    'op', TG_OP,
+                    'guild_id', COALESCE(NEW.guild_id, OLD.guild_id),
+                    'tag_id', COALESCE(NEW.tag_id, OLD.tag_id),
+                    'name', (SELECT name FROM tags WHERE id = COALESCE(NEW.tag_id, OLD.tag_id)),
+                    'alias', COALESCE(NEW.alias, OLD.alias)
+                )::text);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS tags_notify ON tags",
+            """
+            CREATE TRIGGER tags_notify AFTER INSERT OR UPDATE OR DELETE ON tags
+            FOR EACH ROW EXECUTE FUNCTION notify_tag_change()
+            """,
+            "DROP TRIGGER IF EXISTS tag_aliases_notify ON tag_aliases",
+            """
+            CREATE TRIGGER tag_aliases_notify AFTER INSERT OR UPDATE OR DELETE ON tag_aliases
+            FOR EACH ROW EXECUTE FUNCTION notify_tag_alias_change()
+            """,
+        ],
+    ),
+    (
+        7,
+        "tag revisions",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS tag_revisions (
+                tag_id INT NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+                revision INT NOT NULL,
+                editor discorduser,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                content TEXT,
+                delta TEXT,
+                button_links buttonlink[],
+                content_hash TEXT NOT NULL,
+                PRIMARY KEY (tag_id, revision),
+                CHECK ((content IS NULL) <> (delta IS NULL))
+            )
+            """,
+        ],
+    ),
+]
+
+
+async def migrate(conn: asyncpg.Connection) -> int:
+    """Apply every pending migration on `conn` and return the resulting schema version."""
+    logger = logging.getLogger(__name__)
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK)
+    try:
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW()
+            )
+            """,
+        )
+        current: int = await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        for version, description, steps in MIGRATIONS:
+            if version <= current:
+                continue
+            async with conn.transaction():
+                for step in steps:
+                    await conn.execute(step)
+                await conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES ($1, $2)",
+                    version,
+                    description,
+                )
+            logger.info("Applied migration %s: %s", version, description)
+            current = version
+        return current
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK)
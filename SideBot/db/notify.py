@@ -0,0 +1,158 @@
+"""Cross-process tag change notifications over Postgres LISTEN/NOTIFY."""
+
+import asyncio
+import contextlib
+import dataclasses
+import json
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import asyncpg
+
+# Triggers on tags and tag_aliases notify this channel, see migration 6.
+CHANNEL = "sidebot_tags"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class TagEvent:
+    """A change to a tag or an alias, or a RESET after notifications may have been missed."""
+
+    table: str
+    op: str
+    guild_id: int | None = None
+    tag_id: int | None = None
+    name: str | None = None
+    old_name: str | None = None
+    alias: str | None = None
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "TagEvent":
+        """Parse a notification payload."""
+        data: dict[str, Any] = json.loads(payload)
+        return cls(
+            data["table"],
+            data["op"],
+            data.get("guild_id"),
+            data.get("tag_id"),
+            data.get("name"),
+            data.get("old_name"),
+            data.get("alias"),
+        )
+
+    @classmethod
+    def reset(cls) -> "TagEvent":
+        """Build the event sent after reconnecting, when every cached tag may be stale."""
+        return cls("", "RESET")
+
+
+Subscriber = Callable[[TagEvent], Awaitable[None]]
+
+
+class TagListener:
+    """Keeps a dedicated LISTEN connection and hands tag changes to subscribers in order.
+
+    The connection is reopened whenever it is lost, and subscribers then get a
+    RESET event since changes made in between were never delivered. They also
+    get one when the first connection came late, after a failed attempt or
+    after `start` stopped waiting for it.
+    """
+
+    def __init__(self, dsn: str, retry_interval: float = 5.0, health_interval: float = 30.0) -> None:
+        """Initialize the listener for `dsn`, retrying lost connections every `retry_interval` seconds."""
+        self.dsn = dsn
+        self.retry_interval = retry_interval
+        self.health_interval = health_interval
+        self.logger = logging.getLogger(__name__)
+        self._subscribers: list[Subscriber] = []
+        self._queue: asyncio.Queue[TagEvent] = asyncio.Queue()
+        self._tasks: list[asyncio.Task[None]] = []
+        # Set while LISTEN is active.
+        self.listening = asyncio.Event()
+        self._late = False
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        """Call `subscriber` with every tag event."""
+        self._subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Stop calling `subscriber`."""
+        with contextlib.suppress(ValueError):
+            self._subscribers.remove(subscriber)
+
+    async def start(self, timeout: float | None = 10.0) -> bool:
+        """Start listening in the background, waiting up to `timeout` seconds until LISTEN is active.
+
+        Returns whether it became active in time. Otherwise subscribers get a
+        RESET once it does, so state loaded in the meantime is reloaded.
+        """
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._dispatch())]
+        try:
+            await asyncio.wait_for(self.listening.wait(), timeout)
+        except TimeoutError:
+            self._late = True
+            self.logger.warning("Tag listener is not connected yet, tag caches are reset once it is")
+            return False
+        return True
+
+    async def stop(self) -> None:
+        """Stop listening and close the connection."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _notify(self, _conn: object, _pid: int, _channel: str, payload: object) -> None:
+        try:
+            self._queue.put_nowait(TagEvent.from_payload(str(payload)))
+        except (ValueError, KeyError):
+            self.logger.warning("Ignoring malformed tag notification %r", payload)
+
+    async def _listen(self) -> None:
+        # Whether changes may have been missed, as they were not listened for.
+        missed = False
+        while True:
+            try:
+                conn: asyncpg.Connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError) as e:
+                self.logger.warning("Could not open the tag listener connection, retrying: %s", e)
+                missed = True
+                await asyncio.sleep(self.retry_interval)
+                continue
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda _: lost.set())
+            try:
+                await conn.add_listener(CHANNEL, self._notify)
+                self.listening.set()
+                if missed or self._late:
+                    self.logger.info("Tag listener connected late or reconnected, resetting")
+                    self._queue.put_nowait(TagEvent.reset())
+                    self._late = False
+                missed = False
+                await self._watch(conn, lost)
+                self.logger.warning("Lost the tag listener connection, reconnecting")
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, TimeoutError) as e:
+                self.logger.warning("Lost the tag listener connection, reconnecting: %s", e)
+            finally:
+                missed = True
+                self.listening.clear()
+                conn.terminate()
+            await asyncio.sleep(self.retry_interval)
+
+    async def _watch(self, conn: asyncpg.Connection, lost: asyncio.Event) -> None:
+        # A dropped socket is only noticed on the next use, so poke it now and then.
+        while not lost.is_set():
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(lost.wait(), self.health_interval)
+                return
+            await conn.execute("SELECT 1", timeout=self.health_interval)
+
+    async def _dispatch(self) -> None:
+        while True:
+            event = await self._queue.get()
+            for subscriber in list(self._subscribers):
+                try:
+                    await subscriber(event)
+                except Exception:
+                    self.logger.exception("Tag event subscriber failed on %s", event)
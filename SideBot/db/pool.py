@@ -0,0 +1,170 @@
+"""Connection pool module."""
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Sequence
+
+import asyncpg
+from asyncpg.pool import PoolAcquireContext, PoolConnectionProxy
+
+from SideBot.db.statements import statements
+from SideBot.utils import ButtonLink, DiscordUser, PoolConfig
+
+
+async def init_connection(conn: asyncpg.Connection) -> None:
+    """Register the SideBot composite type codecs and prepare statements on a new connection."""
+    await conn.set_type_codec(
+        "discorduser",
+        encoder=DiscordUser.to_tuple,
+        decoder=DiscordUser.from_tuple,
+        format="tuple",
+    )
+    await conn.set_type_codec(
+        "buttonlink",
+        encoder=ButtonLink.to_tuple,
+        decoder=ButtonLink.from_tuple,
+        format="tuple",
+    )
+    await statements.prepare_all(conn)
+
+
+class Replica:
+    """A read replica pool and whether it passed its last health check."""
+
+    __slots__ = ("dsn", "pool", "healthy")
+
+    def __init__(self, dsn: str) -> None:
+        """Initialize the replica for `dsn`, its pool is created by the first health check."""
+        self.dsn = dsn
+        self.pool: asyncpg.Pool | None = None
+        self.healthy = False
+
+
+class ReplicaAcquireContext:
+    """Acquire a connection from a healthy replica, falling back to the primary."""
+
+    __slots__ = ("db", "pool", "conn")
+
+    def __init__(self, db: "DBPool") -> None:
+        """Initialize the context for `db`."""
+        self.db = db
+        self.pool: asyncpg.Pool | None = None
+        self.conn: PoolConnectionProxy | None = None
+
+    async def __aenter__(self) -> PoolConnectionProxy:
+        """Acquire from the replicas in turn, then from the primary."""
+        for replica in self.db.healthy_replicas():
+            if replica.pool is None:
+                continue
+            try:
+                self.conn = await replica.pool.acquire(timeout=self.db.acquire_timeout)
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, TimeoutError) as e:
+                replica.healthy = False
+                self.db.logger.warning("Replica %s failed, marking it down: %s", replica.dsn, e)
+                continue
+            self.pool = replica.pool
+            return self.conn
+        self.pool = self.db.pool
+        self.conn = await self.db.pool.acquire(timeout=self.db.acquire_timeout)
+        return self.conn
+
+    async def __aexit__(self, *_: object) -> None:
+        """Release the connection to the pool it came from."""
+        if self.pool is not None and self.conn is not None:
+            await self.pool.release(self.conn)
+
+
+class DBPool:
+    """A pool of database connections shared by every cog, with optional read replicas.
+
+    Reads that may be slightly stale are sent to healthy replicas in turn
+    through `acquire(readonly=True)`, everything else goes to the primary.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        acquire_timeout: float | None = None,
+        replicas: list[Replica] | None = None,
+        config: PoolConfig | None = None,
+    ) -> None:
+        """Wrap an asyncpg pool with the configured acquire timeout."""
+        self.pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.replicas = replicas or []
+        self.config = config or PoolConfig()
+        self.logger = logging.getLogger(__name__)
+        self._next_replica = 0
+        self._health_task: asyncio.Task[None] | None = None
+
+    @staticmethod
+    async def create_pool(dsn: str, config: PoolConfig) -> asyncpg.Pool:
+        """Create an asyncpg pool, registering codecs and preparing statements on every new connection."""
+        return await asyncpg.create_pool(
+            dsn,
+            min_size=config.min_size,
+            max_size=config.max_size,
+            init=init_connection,
+            # PgBouncer in transaction mode can't keep named statements around.
+            statement_cache_size=100 if config.prepared_statements else 0,
+        )
+
+    @classmethod
+    async def create(cls, dsn: str, config: PoolConfig, replica_dsns: Sequence[str] = ()) -> "DBPool":
+        """Create the primary pool, and the replica pools along with their health checks."""
+        statements.enabled = config.prepared_statements
+        pool = await cls.create_pool(dsn, config)
+        db = cls(pool, config.acquire_timeout, [Replica(replica) for replica in replica_dsns], config)
+        if db.replicas:
+            await db.check_replicas()
+            db._health_task = asyncio.create_task(db._monitor())
+        return db
+
+    def healthy_replicas(self) -> list[Replica]:
+        """Return the healthy replicas, starting from the next one in turn."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return []
+        self._next_replica = (self._next_replica + 1) % len(healthy)
+        return healthy[self._next_replica :] + healthy[: self._next_replica]
+
+    def acquire(self, *, readonly: bool = False) -> PoolAcquireContext | ReplicaAcquireContext:
+        """Acquire a connection, from a replica if `readonly`, waiting at most `acquire_timeout` seconds."""
+        if readonly and self.replicas:
+            return ReplicaAcquireContext(self)
+        return self.pool.acquire(timeout=self.acquire_timeout)
+
+    async def check_replicas(self) -> None:
+        """Connect to every replica without a pool, and mark each one healthy if it answers a query."""
+        timeout = self.config.health_check_interval
+        for replica in self.replicas:
+            healthy = False
+            try:
+                if replica.pool is None:
+                    replica.pool = await asyncio.wait_for(self.create_pool(replica.dsn, self.config), timeout)
+                async with replica.pool.acquire(timeout=timeout) as conn:
+                    await conn.fetchval("SELECT 1", timeout=timeout)
+                healthy = True
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, TimeoutError) as e:
+                self.logger.warning("Replica %s failed its health check: %s", replica.dsn, e)
+            if healthy != replica.healthy:
+                self.logger.info("Replica %s is %s", replica.dsn, "up" if healthy else "down")
+            replica.healthy = healthy
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.health_check_interval)
+            await self.check_replicas()
+
+    async def close(self) -> None:
+        """Gracefully close every connection in the pool and the replica pools."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._health_task
+            self._health_task = None
+        for replica in self.replicas:
+            if replica.pool is not None:
+                await replica.pool.close()
+        await self.pool.close()
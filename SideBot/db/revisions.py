@@ -0,0 +1,188 @@
+"""Tag revision history module.
+
+Each revision stores either a full snapshot of the tag content, or a delta
+against the previous revision, as JSON `[start, end, replacement]` edits of
+the previous content. Button links are stored only when they changed. Every
+`SNAPSHOT_INTERVAL`th revision is a snapshot, so rebuilding a revision reads
+at most that many rows.
+
+Every revision also stores a hash of its full state. Deltas are made against
+the tag row, so when the row was written without a revision, such as by a
+bulk import, its state is recorded as a snapshot first.
+"""
+
+import dataclasses
+import datetime
+import difflib
+import hashlib
+import json
+
+from SideBot.db.statements import Connection, statements
+from SideBot.utils import ButtonLink, DiscordUser
+
+SNAPSHOT_INTERVAL = 10
+
+REVISION_CURRENT = statements.register(
+    "revisions.current",
+    """SELECT t.content, t.button_links, r.revision, r.content_hash FROM tags t
+    LEFT JOIN LATERAL (
+        SELECT revision, content_hash FROM tag_revisions WHERE tag_id = t.id ORDER BY revision DESC LIMIT 1
+    ) r ON TRUE
+    WHERE t.id = $1 FOR UPDATE OF t""",
+)
+REVISION_INSERT = statements.register(
+    "revisions.insert",
+    """INSERT INTO tag_revisions (tag_id, revision, editor, content, delta, button_links, content_hash)
+    VALUES ($1, $2, $3, $4, $5, $6, $7)""",
+)
+REVISION_LIST = statements.register(
+    "revisions.list",
+    """SELECT revision, editor, created_at, content IS NOT NULL AS snapshot, length(COALESCE(content, delta)) AS size
+    FROM tag_revisions WHERE tag_id = $1 ORDER BY revision DESC LIMIT $2 OFFSET $3""",
+)
+# The revisions from the closest snapshot at or before $2 up to $2.
+REVISION_CHAIN = statements.register(
+    "revisions.chain",
+    """SELECT revision, content, delta, button_links FROM tag_revisions
+    WHERE tag_id = $1 AND revision <= $2 AND revision >= (
+        SELECT max(revision) FROM tag_revisions WHERE tag_id = $1 AND revision <= $2 AND content IS NOT NULL
+    )
+    ORDER BY revision""",
+)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class TagRevision:
+    """A revision in a tag's history."""
+
+    revision: int
+    editor: DiscordUser | None
+    created_at: datetime.datetime
+    snapshot: bool
+    size: int
+
+
+def state_hash(content: str, button_links: tuple[ButtonLink, ...]) -> str:
+    """Return the hash of the content and button links of a tag."""
+    state = json.dumps([content, [ButtonLink.to_tuple(link) for link in button_links]], ensure_ascii=False)
+    return hashlib.sha1(state.encode(), usedforsecurity=False).hexdigest()
+
+
+def make_delta(old: str, new: str) -> str:
+    """Return the JSON edits turning `old` into `new`."""
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    edits = [(i1, i2, new[j1:j2]) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+    return json.dumps(edits, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_delta(old: str, delta: str) -> str:
+    """Apply the JSON edits `delta` to `old`."""
+    pieces = []
+    position = 0
+    for start, end, replacement in json.loads(delta):
+        pieces.append(old[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(old[position:])
+    return "".join(pieces)
+
+
+async def record_initial(
+    conn: Connection,
+    tag_id: int,
+    content: str,
+    button_links: tuple[ButtonLink, ...],
+    editor: DiscordUser | None,
+) -> None:
+    """Record the first revision of a new tag."""
+    await _snapshot(conn, tag_id, 1, content, button_links, editor)
+
+
+async def _snapshot(
+    conn: Connection,
+    tag_id: int,
+    revision: int,
+    content: str,
+    button_links: tuple[ButtonLink, ...],
+    editor: DiscordUser | None,
+) -> None:
+    await statements.execute(
+        conn,
+        REVISION_INSERT,
+        tag_id,
+        revision,
+        editor,
+        content,
+        None,
+        button_links,
+        state_hash(content, button_links),
+    )
+
+
+async def record(
+    conn: Connection,
+    tag_id: int,
+    content: str,
+    button_links: tuple[ButtonLink, ...] | None,
+    editor: DiscordUser | None,
+) -> None:
+    """Record the new content and button links of a tag, before the tag row itself is updated.
+
+    Pass None as `button_links` when the update keeps the links of the row.
+    Must run inside the transaction that updates the tag, it locks the tag row.
+    Tags created before revisions existed, or changed without recording a
+    revision, get their current state recorded as a snapshot first.
+    """
+    current = await statements.fetchrow(conn, REVISION_CURRENT, tag_id)
+    if current is None:
+        return
+    old_content: str = current["content"]
+    old_links = tuple(current["button_links"] or ())
+    if button_links is None:
+        button_links = old_links
+    revision: int | None = current["revision"]
+    if revision is None:
+        await record_initial(conn, tag_id, old_content, old_links, None)
+        revision = 1
+    elif current["content_hash"] != state_hash(old_content, old_links):
+        revision += 1
+        await _snapshot(conn, tag_id, revision, old_content, old_links, None)
+    if (old_content, old_links) == (content, button_links):
+        return
+    revision += 1
+    if (revision - 1) % SNAPSHOT_INTERVAL == 0:
+        await _snapshot(conn, tag_id, revision, content, button_links, editor)
+        return
+    await statements.execute(
+        conn,
+        REVISION_INSERT,
+        tag_id,
+        revision,
+        editor,
+        None,
+        make_delta(old_content, content),
+        button_links if button_links != old_links else None,
+        state_hash(content, button_links),
+    )
+
+
+async def history(conn: Connection, tag_id: int, limit: int, offset: int = 0) -> list[TagRevision]:
+    """Get the revisions of a tag, newest first."""
+    rows = await statements.fetch(conn, REVISION_LIST, tag_id, limit, offset)
+    return [
+        TagRevision(row["revision"], row["editor"], row["created_at"], row["snapshot"], row["size"]) for row in rows
+    ]
+
+
+async def load(conn: Connection, tag_id: int, revision: int) -> tuple[str, tuple[ButtonLink, ...]] | None:
+    """Rebuild the content and button links of a tag at `revision`, or None if there is no such revision."""
+    rows = await statements.fetch(conn, REVISION_CHAIN, tag_id, revision)
+    if not rows or rows[-1]["revision"] != revision:
+        return None
+    content = ""
+    button_links: tuple[ButtonLink, ...] = ()
+    for row in rows:
+        content = row["content"] if row["content"] is not None else apply_delta(content, row["delta"])
+        if row["button_links"] is not None:
+            button_links = tuple(row["button_links"])
+    return content, button_links
@@ -0,0 +1,116 @@
+"""On-disk snapshot of the tag name index for warm starts.
+
+The file is a fixed header followed by length-prefixed records, all little
+endian:
+
+    header: magic, version, saved_at (unix seconds), tag count, alias count, crc32 of the rest
+    tag:    guild_id (i64), tag_id (i32), name length (u16), name (utf-8)
+    alias:  guild_id (i64), alias length (u16), name length (u16), alias, name (utf-8)
+
+The checksum covers the header fields before it and the body. A snapshot with
+another magic, version or checksum, or with records that cannot be parsed, is
+ignored.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Iterator
+
+from SideBot.db.index import TagNameIndex
+
+MAGIC = b"SBTI"
+VERSION = 2
+
+HEADER = struct.Struct("<4sHdIII")
+# The header fields covered by the checksum, all but the checksum itself.
+CHECKED = HEADER.size - 4
+TAG = struct.Struct("<qiH")
+ALIAS = struct.Struct("<qHH")
+
+
+def _tags(buffer: mmap.mmap, offset: int, count: int) -> Iterator[tuple[int, int, str]]:
+    for _ in range(count):
+        guild_id, tag_id, length = TAG.unpack_from(buffer, offset)
+        offset += TAG.size
+        yield guild_id, tag_id, buffer[offset : offset + length].decode()
+        offset += length
+
+
+def _aliases(buffer: mmap.mmap, offset: int, count: int) -> Iterator[tuple[int, str, str]]:
+    for _ in range(count):
+        guild_id, alias_length, name_length = ALIAS.unpack_from(buffer, offset)
+        offset += ALIAS.size
+        alias = buffer[offset : offset + alias_length].decode()
+        offset += alias_length
+        yield guild_id, alias, buffer[offset : offset + name_length].decode()
+        offset += name_length
+
+
+def _skip_tags(buffer: mmap.mmap, offset: int, count: int) -> int:
+    for _ in range(count):
+        offset += TAG.size + TAG.unpack_from(buffer, offset)[2]
+    return offset
+
+
+def save_snapshot(path: str, index: TagNameIndex, saved_at: float) -> None:
+    """Atomically write the tags and aliases of `index` to `path`, as of the unix time `saved_at`."""
+    body = bytearray()
+    tags = 0
+    for guild_id, tag_id, name in index.tags():
+        encoded = name.encode()
+        body += TAG.pack(guild_id, tag_id, len(encoded))
+        body += encoded
+        tags += 1
+    aliases = 0
+    for guild_id, alias, name in index.aliases():
+        encoded_alias, encoded_name = alias.encode(), name.encode()
+        body += ALIAS.pack(guild_id, len(encoded_alias), len(encoded_name))
+        body += encoded_alias
+        body += encoded_name
+        aliases += 1
+    header = HEADER.pack(MAGIC, VERSION, saved_at, tags, aliases, 0)[:CHECKED]
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, saved_at, tags, aliases, zlib.crc32(body, zlib.crc32(header))))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: str, index: TagNameIndex) -> float | None:
+    """Load the snapshot at `path` into `index`, returning when it was saved, or None if unusable."""
+    logger = logging.getLogger(__name__)
+    try:
+        f = open(path, "rb")  # noqa: SIM115
+    except FileNotFoundError:
+        return None
+    with f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file.
+            return None
+        with buffer:
+            if len(buffer) < HEADER.size:
+                return None
+            magic, version, saved_at, tags, aliases, checksum = HEADER.unpack_from(buffer, 0)
+            if magic != MAGIC:
+                logger.warning("Ignoring %s, it is not a tag snapshot", path)
+                return None
+            if version != VERSION:
+                logger.warning("Ignoring tag snapshot %s with version %s", path, version)
+                return None
+            if zlib.crc32(memoryview(buffer)[HEADER.size :], zlib.crc32(buffer[:CHECKED])) != checksum:
+                logger.warning("Ignoring corrupt tag snapshot %s", path)
+                return None
+            try:
+                aliases_offset = _skip_tags(buffer, HEADER.size, tags)
+                index.load(_tags(buffer, HEADER.size, tags), _aliases(buffer, aliases_offset, aliases))
+            except (struct.error, UnicodeDecodeError) as e:
+                logger.warning("Ignoring malformed tag snapshot %s: %s", path, e)
+                return None
+    return saved_at
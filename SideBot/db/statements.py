@@ -0,0 +1,73 @@
+"""Prepared statement registry module."""
+
+import logging
+from typing import Any
+
+import asyncpg
+from asyncpg.pool import PoolConnectionProxy
+
+Connection = asyncpg.Connection | PoolConnectionProxy
+
+
+class StatementRegistry:
+    """Named queries that are prepared once per connection and reused.
+
+    Statements are kept in asyncpg's per-connection statement cache, keyed by
+    query text. asyncpg would prepare them on first use anyway, preparing them
+    when the connection opens keeps that round trip off the first command using
+    each one. Set `enabled` to False when running behind a pooler such as
+    PgBouncer in transaction mode, which can't keep prepared statements around.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self.queries: dict[str, str] = {}
+        self.enabled = True
+        self.logger = logging.getLogger(__name__)
+
+    def __len__(self) -> int:
+        """Return the amount of registered queries."""
+        return len(self.queries)
+
+    def __getitem__(self, name: str) -> str:
+        """Return the query text registered as `name`."""
+        return self.queries[name]
+
+    def register(self, name: str, query: str) -> str:
+        """Register `query` under `name` and return the name."""
+        if name in self.queries and self.queries[name] != query:
+            msg = f"Statement {name} is already registered"
+            raise ValueError(msg)
+        self.queries[name] = query
+        return name
+
+    async def prepare_all(self, conn: Connection) -> None:
+        """Prepare every registered query on `conn`."""
+        if not self.enabled:
+            return
+        for name, query in self.queries.items():
+            try:
+                # An empty executemany prepares the statement into the
+                # connection's statement cache without running it.
+                await conn.executemany(query, [])
+            except asyncpg.PostgresError:
+                self.logger.warning("Could not prepare statement %s", name, exc_info=True)
+
+    async def execute(self, conn: Connection, name: str, *args: Any) -> str:
+        """Execute the statement `name`."""
+        return await conn.execute(self.queries[name], *args)
+
+    async def fetch(self, conn: Connection, name: str, *args: Any) -> list[asyncpg.Record]:
+        """Fetch every row of the statement `name`."""
+        return await conn.fetch(self.queries[name], *args)
+
+    async def fetchrow(self, conn: Connection, name: str, *args: Any) -> asyncpg.Record | None:
+        """Fetch the first row of the statement `name`."""
+        return await conn.fetchrow(self.queries[name], *args)
+
+    async def fetchval(self, conn: Connection, name: str, *args: Any) -> Any:
+        """Fetch the first value of the first row of the statement `name`."""
+        return await conn.fetchval(self.queries[name], *args)
+
+
+statements = StatementRegistry()
@@ -1,263 +1,544 @@
 """Tags database module."""
 
 import contextlib
+import dataclasses
 import datetime
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, AsyncIterator
 from typing import Any
 
 import asyncpg
 
+from SideBot.db.cache import LRUCache
+from SideBot.db import revisions
+from SideBot.db.index import TagNameIndex
+from SideBot.db.notify import TagEvent
+from SideBot.db.pool import DBPool
+from SideBot.db.revisions import TagRevision
+from SideBot.db.statements import statements
+from SideBot.db.usage import UsageBuffer, UsageEvent, hour_bucket
 from SideBot.utils import ButtonLink, DiscordUser
 
+tag_cache: LRUCache[tuple[int, str], "Tag"] = LRUCache()
+usage_buffer = UsageBuffer()
+name_index = TagNameIndex()
+# Tag events notified while the index loads, one list per running load. The
+# loaded rows may predate them, so they are applied again once it is done.
+_held_events: list[list[TagEvent]] = []
 
-class _Tags:
-    """Internal DB class for tags."""
+# Every column except the search vector, which is only used inside Postgres.
+TAG_COLUMNS = "guild_id, id, name, content, author, created_at, updated_at, button_links, used"
 
-    @staticmethod
-    async def write_schema(conn: asyncpg.Connection) -> None:
-        for x in [
-            """
-            CREATE TYPE public.discorduser AS (
-                id BIGINT,
-                name TEXT
-            )
-            """,
-            """
-            CREATE TYPE public.buttonlink AS (
-                label TEXT,
-                url TEXT
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS tags (
-                guild_id BIGINT,
-                id SERIAL PRIMARY KEY NOT NULL UNIQUE,
-                name TEXT NOT NULL,
-                content TEXT NOT NULL,
-                author discorduser NOT NULL,
-                created_at TIMESTAMP DEFAULT NOW(),
-                updated_at TIMESTAMP DEFAULT NOW(),
-                button_links buttonlink[],
-                used BIGINT DEFAULT 0
-            )
-            """,
-            "CREATE INDEX IF NOT EXISTS tags_guild_id_idx ON tags (guild_id, name)",
-        ]:
-            with contextlib.suppress(asyncpg.exceptions.DuplicateObjectError):
-                await conn.execute(
-                    x,
-                )
-
-    def __init__(self, conn: asyncpg.Connection) -> None:
-        """Tag database operations."""
-        self.conn: asyncpg.Connection = conn
-
-    async def get(self, guild_id: int, tag_name: str) -> asyncpg.Record | None:
-        """Get a tag."""
-        return await self.conn.fetchrow(
-            "SELECT * FROM tags WHERE guild_id = $1 AND name = $2",
-            guild_id,
-            tag_name,
-        )
+# The id of the tag named $2, or else of the tag $2 is an alias of. Both
+# branches are primary/index lookups, so aliases cost the same single query.
+TAG_RESOLVE = """(
+    SELECT id FROM tags WHERE guild_id = $1 AND name = $2
+    UNION ALL
+    SELECT tag_id FROM tag_aliases WHERE guild_id = $1 AND alias = $2
+    LIMIT 1
+)"""
 
-    async def get_all(
-        self,
-        guild_id: int,
-    ) -> AsyncGenerator[asyncpg.Record, asyncpg.Record]:
-        """Get all tags."""
-        fetchrow = await self.conn.fetch(
-            "SELECT * FROM tags WHERE guild_id = $1",
-            guild_id,
-        )
-        for row in fetchrow:
-            yield row
+TAG_GET = statements.register(
+    "tags.get",
+    f"SELECT {TAG_COLUMNS} FROM tags WHERE id = {TAG_RESOLVE}",
+)
+TAG_GET_EXACT = statements.register(
+    "tags.get_exact",
+    f"SELECT {TAG_COLUMNS} FROM tags WHERE guild_id = $1 AND name = $2",
+)
+TAG_GET_COUNTED = statements.register(
+    "tags.get_counted",
+    f"UPDATE tags SET used = used + 1 WHERE id = {TAG_RESOLVE} RETURNING {TAG_COLUMNS}",
+)
+TAG_GET_ALL = statements.register(
+    "tags.get_all",
+    f"SELECT {TAG_COLUMNS} FROM tags WHERE guild_id = $1",
+)
+TAG_PAGE_BY_NAME = statements.register(
+    "tags.page_by_name",
+    "SELECT name, used FROM tags WHERE guild_id = $1 AND name > $2 ORDER BY name LIMIT $3",
+)
+TAG_PAGE_BY_USAGE = statements.register(
+    "tags.page_by_usage",
+    """SELECT name, used FROM tags WHERE guild_id = $1 AND (used, name) < ($2, $3)
+    ORDER BY used DESC, name DESC LIMIT $4""",
+)
+TAG_SEARCH = statements.register(
+    "tags.search",
+    """SELECT name, ts_headline(
+        'english', content, query, 'MaxFragments=1, MinWords=8, MaxWords=25, StartSel=**, StopSel=**'
+    ) AS snippet
+    FROM (
+        SELECT name, content, query, ts_rank(search, query) * ln(2 + used) AS score
+        FROM tags, websearch_to_tsquery('english', $2) AS query
+        WHERE guild_id = $1 AND search @@ query
+        ORDER BY score DESC, name
+        LIMIT $3 OFFSET $4
+    ) AS ranked
+    ORDER BY score DESC, name""",
+)
+TAG_GET_NAMES = statements.register(
+    "tags.get_names",
+    "SELECT guild_id, id, name FROM tags",
+)
+TAG_GET_NAMES_CHANGED = statements.register(
+    "tags.get_names_changed",
+    "SELECT guild_id, id, name FROM tags WHERE updated_at > $1 OR created_at > $1 OR id = ANY($2::int[])",
+)
+TAG_GET_IDS = statements.register(
+    "tags.get_ids",
+    "SELECT id FROM tags",
+)
+TAG_GET_ALIASES = statements.register(
+    "tags.get_aliases",
+    "SELECT a.guild_id, a.alias, t.name FROM tag_aliases a JOIN tags t ON t.id = a.tag_id",
+)
+TAG_ALIAS_CREATE = statements.register(
+    "tags.alias_create",
+    """INSERT INTO tag_aliases (guild_id, alias, tag_id)
+    SELECT $1, $2, $3 WHERE NOT EXISTS (SELECT 1 FROM tags WHERE guild_id = $1 AND name = $2)
+    ON CONFLICT DO NOTHING""",
+)
+TAG_ALIAS_DELETE = statements.register(
+    "tags.alias_delete",
+    "DELETE FROM tag_aliases WHERE guild_id = $1 AND alias = $2",
+)
+TAG_CREATE = statements.register(
+    "tags.create",
+    """INSERT INTO tags
+    (guild_id, name, content, author, button_links, used)
+    VALUES
+    ($1, $2, $3, $4, $5, $6)
+    RETURNING id""",
+)
+TAG_SAVE = statements.register(
+    "tags.save",
+    """UPDATE tags SET
+    guild_id = $1, name = $2, content = $3, author = $4, button_links = $5, updated_at = $7
+    WHERE id = $6""",
+)
+TAG_DELETE = statements.register(
+    "tags.delete",
+    "DELETE FROM tags WHERE guild_id = $1 AND name = $2",
+)
+TAG_UPDATE = statements.register(
+    "tags.update",
+    "UPDATE tags SET content = $1, updated_at = $4 WHERE guild_id = $2 AND name = $3",
+)
+TAG_UPDATE_USED_COUNTS = statements.register(
+    "tags.update_used_counts",
+    """UPDATE tags SET used = tags.used + u.count
+    FROM unnest($1::int[], $2::bigint[]) AS u(id, count)
+    WHERE tags.id = u.id""",
+)
+TAG_USAGE_EVENTS_INSERT = statements.register(
+    "tags.usage_events_insert",
+    """INSERT INTO tag_usage_events (guild_id, tag_id, user_id, bucket, count)
+    SELECT * FROM unnest($1::bigint[], $2::int[], $3::bigint[], $4::timestamptz[], $5::int[])""",
+)
+# Moves the events of finished hours into the hourly rollup. Events of an hour
+# flushed after it was rolled up are added on top, so `users` may overcount.
+TAG_USAGE_ROLLUP_HOURLY = statements.register(
+    "tags.usage_rollup_hourly",
+    """WITH moved AS (
+        DELETE FROM tag_usage_events WHERE bucket < $1 RETURNING guild_id, tag_id, user_id, bucket, count
+    )
+    INSERT INTO tag_usage_hourly AS h (guild_id, tag_id, bucket, uses, users)
+    SELECT guild_id, tag_id, bucket, sum(count), count(DISTINCT user_id) FROM moved
+    GROUP BY guild_id, tag_id, bucket
+    ON CONFLICT (guild_id, tag_id, bucket) DO UPDATE SET uses = h.uses + excluded.uses, users = h.users + excluded.users""",
+)
+# Recomputes the daily rollup of every day since $1 from the hourly rollup.
+TAG_USAGE_ROLLUP_DAILY = statements.register(
+    "tags.usage_rollup_daily",
+    """INSERT INTO tag_usage_daily AS d (guild_id, tag_id, day, uses)
+    SELECT guild_id, tag_id, (bucket AT TIME ZONE 'UTC')::date, sum(uses) FROM tag_usage_hourly
+    WHERE bucket >= $1
+    GROUP BY 1, 2, 3
+    ON CONFLICT (guild_id, tag_id, day) DO UPDATE SET uses = excluded.uses""",
+)
+TAG_USAGE_PRUNE_HOURLY = statements.register(
+    "tags.usage_prune_hourly",
+    "DELETE FROM tag_usage_hourly WHERE bucket < $1",
+)
+TAG_USAGE_PRUNE_DAILY = statements.register(
+    "tags.usage_prune_daily",
+    "DELETE FROM tag_usage_daily WHERE day < $1",
+)
+TAG_STATS_HOURLY = statements.register(
+    "tags.stats_hourly",
+    """SELECT t.name, sum(h.uses) AS uses
+    FROM tag_usage_hourly h JOIN tags t ON t.id = h.tag_id
+    WHERE h.guild_id = $1 AND h.bucket >= $2
+    GROUP BY t.name ORDER BY uses DESC, t.name LIMIT $3""",
+)
+TAG_STATS_DAILY = statements.register(
+    "tags.stats_daily",
+    """SELECT t.name, sum(d.uses) AS uses
+    FROM tag_usage_daily d JOIN tags t ON t.id = d.tag_id
+    WHERE d.guild_id = $1 AND d.day >= $2
+    GROUP BY t.name ORDER BY uses DESC, t.name LIMIT $3""",
+)
 
-    async def create(
-        self,
-        guild_id: int,
-        tag_name: str,
-        content: str,
-        author: DiscordUser,
-        button_links: list[ButtonLink],
-        used: int = 0,
-    ) -> None:
-        """Create a tag."""
-        await self.conn.execute(
-            """INSERT INTO tags
-            (guild_id, name, content, author, button_links, used)
-            VALUES
-            ($1, $2, $3, $4, $5, $6)""",
-            guild_id,
-            tag_name,
-            content,
-            author,
-            button_links,
-            used,
-        )
 
-    async def save(
-        self,
-        tag_id: int,
-        guild_id: int,
-        tag_name: str,
-        content: str,
-        author: DiscordUser,
-        button_links: list[ButtonLink],
-        used: int = 0,
-    ) -> None:
-        """Save a tag."""
-        await self.conn.execute(
-            """UPDATE tags SET
-            guild_id = $1, name = $2, content = $3, author = $4, button_links = $5, used = $6
-            WHERE id = $7 """,
-            guild_id,
-            tag_name,
-            content,
-            author,
-            button_links,
-            used,
-            tag_id,
-        )
+def _apply_to_index(event: TagEvent) -> None:
+    """Update the name index entries a tag or alias change affects."""
+    if event.guild_id is None:
+        return
+    if event.table == "tag_aliases":
+        if event.alias is None:
+            return
+        if event.op == "DELETE":
+            name_index.remove_alias(event.guild_id, event.alias)
+        elif event.name is not None:
+            name_index.add_alias(event.guild_id, event.alias, event.name)
+        return
+    if event.tag_id is None:
+        return
+    if event.op == "DELETE":
+        name_index.remove_id(event.tag_id)
+    elif event.name is not None:
+        name_index.add(event.guild_id, event.tag_id, event.name)
 
-    async def delete(self, guild_id: int, tag_name: str) -> None:
-        """Delete a tag."""
-        await self.conn.execute(
-            "DELETE FROM tags WHERE guild_id = $1 AND name = $2",
-            guild_id,
-            tag_name,
-        )
 
-    async def update(self, guild_id: int, tag_name: str, content: str) -> None:
-        """Update a tag."""
-        await self.conn.execute(
-            "UPDATE tags SET content = $1, updated_at = $4 WHERE guild_id = $2 AND name = $3",
-            content,
-            guild_id,
-            tag_name,
-            datetime.datetime.now(),  # noqa: DTZ005
-        )
+@dataclasses.dataclass(frozen=True, slots=True)
+class Tag:
+    """An immutable tag record, use `replace` to derive an edited copy."""
+
+    guildid: int
+    tagname: str
+    content: str
+    author: DiscordUser
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    button_links: tuple[ButtonLink, ...] = ()
+    used_count: int = 0
+    id: int | None = None
 
-    async def update_used_count(self, guild_id: int, tag_name: str) -> None:
-        """Update used count."""
-        await self.conn.execute(
-            "UPDATE tags SET used = used + 1 WHERE guild_id = $1 AND name = $2",
-            guild_id,
-            tag_name,
+    @classmethod
+    def from_record(cls, row: asyncpg.Record) -> "Tag":
+        """Build a tag from a row with the `TAG_COLUMNS` columns."""
+        return cls(
+            row["guild_id"],
+            row["name"],
+            row["content"],
+            row["author"],
+            row["created_at"],
+            row["updated_at"],
+            tuple(row["button_links"] or ()),
+            row["used"],
+            row["id"],
         )
 
+    @classmethod
+    def new(cls, guild_id: int, tag_name: str, content: str, author: DiscordUser) -> "Tag":
+        """Build a tag that has not been created yet."""
+        now = datetime.datetime.now(tz=datetime.UTC)
+        return cls(guild_id, tag_name, content, author, now, now)
 
-class Tag:
-    """Tag class."""
+    def replace(self, **changes: Any) -> "Tag":
+        """Return a copy of the tag with `changes` applied."""
+        return dataclasses.replace(self, **changes)
 
-    def __init__(
-        self,
-        guild_id: int,
-        tagname: str,
-        content: str,
-        author: DiscordUser,
-        created_at: datetime.datetime,
-        updated_at: datetime.datetime,
-        button_links: list[ButtonLink],
-        used_count: int,
-        ident: int | None,
-        conn: asyncpg.Connection,
-    ) -> None:
-        """Tag class."""
-        self.guildid = guild_id
-        self.tagname = tagname
-        self.content = content
-        self.author = author
-        self.created_at = created_at
-        self.updated_at = updated_at
-        self.button_links = button_links
-        self.used_count = used_count
-        self.id = ident
-        self.tags = _Tags(conn)
-
-    @staticmethod
-    async def write_schema(
-        conn: asyncpg.Connection,
-    ) -> None:
-        """Tag class."""
-        await _Tags.write_schema(conn)
 
-    @classmethod
+class TagRepository:
+    """Tag database operations on a connection pool."""
+
+    __slots__ = ("pool",)
+
+    def __init__(self, pool: DBPool) -> None:
+        """Initialize the repository on `pool`."""
+        self.pool = pool
+
     async def get(
-        cls,
+        self,
         guild_id: int,
         tag_name: str,
-        conn: asyncpg.Connection,
-    ) -> "Tag":
-        """Get a tag."""
-        tag = await _Tags(conn).get(guild_id, tag_name)
-        if not tag:
+        *,
+        count: bool = True,
+        user_id: int = 0,
+        readonly: bool = False,
+        aliases: bool = True,
+    ) -> Tag:
+        """Get a tag by name or alias, counting it as a use by `user_id` unless `count` is False.
+
+        Set `aliases` to False to only match the tag's own name, as when deleting
+        it. Counted lookups always match aliases.
+
+        Set `readonly` when the tag is only displayed, so an uncounted cache miss
+        may be served by a read replica. Counted lookups always go to the primary,
+        which counts the use and returns the tag in one round trip and caches it.
+        Don't use `readonly` before writing the tag back.
+        """
+        # Tags are cached under their own name only, so aliases share the entry.
+        if aliases:
+            tag_name = name_index.resolve(guild_id, tag_name)
+        tag = tag_cache.get((guild_id, tag_name))
+        if tag is not None:
+            if count and tag.id is not None:
+                usage_buffer.add(guild_id, tag.id, user_id)
+                # Count the use in the cached copy too, so it shows the same count the database will.
+                tag = tag.replace(used_count=tag.used_count + 1)
+                tag_cache.replace((guild_id, tag_name), tag)
+            return tag
+        uncounted = TAG_GET if aliases else TAG_GET_EXACT
+        if readonly and not count and self.pool.replicas:
+            async with self.pool.acquire(readonly=True) as conn:
+                row = await statements.fetchrow(conn, uncounted, guild_id, tag_name)
+            if row is None:
+                msg = f"Tag {tag_name} not found"
+                raise ValueError(msg)
+            # Not cached: a lagging replica could hand out a tag that was
+            # changed after its invalidation notice, and it would stick around.
+            return Tag.from_record(row)
+        async with self.pool.acquire() as conn:
+            # A counted lookup records the use in the same round trip.
+            row = await statements.fetchrow(conn, TAG_GET_COUNTED if count else uncounted, guild_id, tag_name)
+        if row is None:
             msg = f"Tag {tag_name} not found"
             raise ValueError(msg)
-        await _Tags(conn).update_used_count(guild_id, tag_name)
-        return cls(
-            guild_id,
-            tag_name,
-            tag["content"],
-            tag["author"],
-            tag["created_at"],
-            tag["updated_at"],
-            tag["button_links"],
-            tag["used"],
-            tag["id"],
-            conn,
-        )
+        tag = Tag.from_record(row)
+        tag_cache.set((guild_id, tag.tagname), tag)
+        if count and tag.id is not None:
+            usage_buffer.add(guild_id, tag.id, user_id, counted=True)
+        return tag
 
-    @classmethod
-    async def get_all(
-        cls,
+    async def get_all(self, guild_id: int) -> AsyncGenerator[Tag, None]:
+        """Get all tags, streaming them from a server-side cursor."""
+        async with self.pool.acquire(readonly=True) as conn, conn.transaction():
+            async for row in conn.cursor(statements[TAG_GET_ALL], guild_id):
+                yield Tag.from_record(row)
+
+    async def page(
+        self,
         guild_id: int,
-        conn: asyncpg.Connection,
-    ) -> AsyncGenerator["Tag", Any]:
-        """Get all tags."""
-        async for tag in _Tags(conn).get_all(guild_id):
-            yield cls(
-                guild_id,
-                tag["name"],
-                tag["content"],
-                tag["author"],
-                tag["created_at"],
-                tag["updated_at"],
-                tag["button_links"],
-                tag["used"],
-                tag["id"],
+        after: tuple[str, int] | None = None,
+        limit: int = 25,
+        *,
+        by_usage: bool = False,
+    ) -> list[tuple[str, int]]:
+        """Get a page of (name, used) pairs, sorted by name or by usage, starting after the key `after`."""
+        async with self.pool.acquire(readonly=True) as conn:
+            if by_usage:
+                name, used = after if after is not None else ("", 2**63 - 1)
+                rows = await statements.fetch(conn, TAG_PAGE_BY_USAGE, guild_id, used, name, limit)
+            else:
+                rows = await statements.fetch(conn, TAG_PAGE_BY_NAME, guild_id, after[0] if after else "", limit)
+        return [(row["name"], row["used"]) for row in rows]
+
+    async def search(self, guild_id: int, query: str, limit: int = 5, offset: int = 0) -> list[tuple[str, str]]:
+        """Search tag names and content, returning (name, snippet) pairs ranked by relevance and usage."""
+        async with self.pool.acquire(readonly=True) as conn:
+            rows = await statements.fetch(conn, TAG_SEARCH, guild_id, query, limit, offset)
+        return [(row["name"], row["snippet"]) for row in rows]
+
+    async def get_names(self) -> list[tuple[int, int, str]]:
+        """Get the guild, id and name of every tag."""
+        async with self.pool.acquire() as conn:
+            rows = await statements.fetch(conn, TAG_GET_NAMES)
+        return [(row["guild_id"], row["id"], row["name"]) for row in rows]
+
+    async def get_aliases(self) -> list[tuple[int, str, str]]:
+        """Get the guild, alias and tag name of every alias."""
+        async with self.pool.acquire() as conn:
+            rows = await statements.fetch(conn, TAG_GET_ALIASES)
+        return [(row["guild_id"], row["alias"], row["name"]) for row in rows]
+
+    @contextlib.asynccontextmanager
+    async def _holding_events(self) -> AsyncIterator[None]:
+        held: list[TagEvent] = []
+        _held_events.append(held)
+        try:
+            yield
+        finally:
+            _held_events.remove(held)
+        for event in held:
+            _apply_to_index(event)
+
+    async def load_index(self) -> None:
+        """Load every tag name and alias into the in-memory name index."""
+        async with self._holding_events():
+            name_index.load(await self.get_names(), await self.get_aliases())
+
+    async def reconcile_index(self, since: datetime.datetime) -> None:
+        """Bring an index loaded from a snapshot taken at `since` up to date.
+
+        Only tags created or updated after `since` are fetched, along with the
+        ids of every tag to find deleted and reimported ones.
+        """
+        async with self._holding_events():
+            async with self.pool.acquire() as conn:
+                ids = {row["id"] for row in await statements.fetch(conn, TAG_GET_IDS)}
+                known = name_index.tag_ids()
+                rows = await statements.fetch(conn, TAG_GET_NAMES_CHANGED, since, list(ids - known))
+            for tag_id in known - ids:
+                name_index.remove_id(tag_id)
+            for row in rows:
+                name_index.add(row["guild_id"], row["id"], row["name"])
+            name_index.set_aliases(await self.get_aliases())
+
+    async def apply_event(self, event: TagEvent) -> None:
+        """Drop the cache entries and update the index entries a tag change made in any process affects."""
+        if event.op == "RESET":
+            tag_cache.clear()
+            await self.load_index()
+            return
+        if event.guild_id is None:
+            return
+        if event.table != "tag_aliases":
+            for name in (event.name, event.old_name):
+                if name is not None:
+                    tag_cache.invalidate((event.guild_id, name))
+        _apply_to_index(event)
+        for held in _held_events:
+            held.append(event)
+
+    def track_usage(self) -> None:
+        """Start flushing buffered tag usage counts to the database."""
+        usage_buffer.start(self.record_usage)
+
+    async def create(self, tag: Tag, editor: DiscordUser | None = None) -> None:
+        """Create a tag, recording it as its first revision."""
+        async with self.pool.acquire() as conn, conn.transaction():
+            tag_id = await statements.fetchval(
                 conn,
+                TAG_CREATE,
+                tag.guildid,
+                tag.tagname,
+                tag.content,
+                tag.author,
+                tag.button_links,
+                tag.used_count,
             )
+            await revisions.record_initial(conn, tag_id, tag.content, tag.button_links, editor or tag.author)
+        tag_cache.invalidate((tag.guildid, tag.tagname))
+        name_index.add(tag.guildid, tag_id, tag.tagname)
 
-    async def create(self) -> None:
-        """Create a tag."""
-        await self.tags.create(
-            self.guildid,
-            self.tagname,
-            self.content,
-            self.author,
-            self.button_links,
-            self.used_count,
-        )
+    async def save(self, tag: Tag, editor: DiscordUser | None = None) -> None:
+        """Save a tag and record the revision, creating it if it has no id, and leaving the used count alone."""
+        if tag.id is None:
+            return await self.create(tag, editor)
+        async with self.pool.acquire() as conn, conn.transaction():
+            await revisions.record(conn, tag.id, tag.content, tag.button_links, editor)
+            await statements.execute(
+                conn,
+                TAG_SAVE,
+                tag.guildid,
+                tag.tagname,
+                tag.content,
+                tag.author,
+                tag.button_links,
+                tag.id,
+                datetime.datetime.now(),  # noqa: DTZ005
+            )
+        tag_cache.invalidate((tag.guildid, tag.tagname))
+        name_index.add(tag.guildid, tag.id, tag.tagname)
+        return None
 
-    async def delete(self) -> None:
+    async def delete(self, tag: Tag) -> None:
         """Delete a tag."""
-        await self.tags.delete(self.guildid, self.tagname)
-
-    async def update(self) -> None:
-        """Update a tag."""
-        await self.tags.update(self.guildid, self.tagname, self.content)
-
-    async def save(self) -> None:
-        """Save a tag."""
-        if not self.id:
-            return await self.create()
-        await self.tags.save(
-            self.id,
-            self.guildid,
-            self.tagname,
-            self.content,
-            self.author,
-            self.button_links,
-            self.used_count,
-        )
-        return None
+        async with self.pool.acquire() as conn:
+            await statements.execute(conn, TAG_DELETE, tag.guildid, tag.tagname)
+        tag_cache.invalidate((tag.guildid, tag.tagname))
+        name_index.remove(tag.guildid, tag.tagname)
+
+    async def update(self, tag: Tag, editor: DiscordUser | None = None) -> None:
+        """Update the content of a tag and record the revision."""
+        async with self.pool.acquire() as conn, conn.transaction():
+            if tag.id is not None:
+                # Only the content is written, so the revision keeps the links the row has now.
+                await revisions.record(conn, tag.id, tag.content, None, editor)
+            await statements.execute(
+                conn,
+                TAG_UPDATE,
+                tag.content,
+                tag.guildid,
+                tag.tagname,
+                datetime.datetime.now(),  # noqa: DTZ005
+            )
+        tag_cache.invalidate((tag.guildid, tag.tagname))
+
+    async def history(self, tag: Tag, limit: int = 10, offset: int = 0) -> list[TagRevision]:
+        """Get the revisions of `tag`, newest first."""
+        if tag.id is None:
+            return []
+        async with self.pool.acquire(readonly=True) as conn:
+            return await revisions.history(conn, tag.id, limit, offset)
+
+    async def revert(self, tag: Tag, revision: int, editor: DiscordUser | None = None) -> Tag | None:
+        """Restore the content and button links `tag` had at `revision` as a new revision.
+
+        Returns the reverted tag, or None if there is no such revision.
+        """
+        if tag.id is None:
+            return None
+        async with self.pool.acquire() as conn:
+            state = await revisions.load(conn, tag.id, revision)
+        if state is None:
+            return None
+        content, button_links = state
+        reverted = tag.replace(content=content, button_links=button_links)
+        await self.save(reverted, editor)
+        return reverted
+
+    async def add_alias(self, tag: Tag, alias: str) -> bool:
+        """Add `alias` for `tag`, unless a tag or alias with that name exists."""
+        async with self.pool.acquire() as conn:
+            status = await statements.execute(conn, TAG_ALIAS_CREATE, tag.guildid, alias, tag.id)
+        if status.endswith(" 0"):
+            return False
+        name_index.add_alias(tag.guildid, alias, tag.tagname)
+        return True
+
+    async def remove_alias(self, guild_id: int, alias: str) -> bool:
+        """Remove `alias`, returning whether it existed."""
+        async with self.pool.acquire() as conn:
+            status = await statements.execute(conn, TAG_ALIAS_DELETE, guild_id, alias)
+        name_index.remove_alias(guild_id, alias)
+        return not status.endswith(" 0")
+
+    async def record_usage(
+        self,
+        tag_ids: list[int],
+        counts: list[int],
+        events: list[tuple[UsageEvent, int]],
+    ) -> None:
+        """Add `counts` to the used count of each tag in `tag_ids` and append the usage `events`."""
+        columns: tuple[list[Any], ...] = ([], [], [], [], [])
+        for (guild_id, tag_id, user_id, bucket), count in events:
+            for column, value in zip(columns, (guild_id, tag_id, user_id, bucket, count), strict=True):
+                column.append(value)
+        async with self.pool.acquire() as conn, conn.transaction():
+            if tag_ids:
+                await statements.execute(conn, TAG_UPDATE_USED_COUNTS, tag_ids, counts)
+            if events:
+                await statements.execute(conn, TAG_USAGE_EVENTS_INSERT, *columns)
+
+    async def rollup_usage(self, hourly_retention: int, daily_retention: int) -> None:
+        """Roll finished hours of usage events up, then prune rollups older than the retention in days."""
+        hour = hour_bucket()
+        today = hour.replace(hour=0)
+        async with self.pool.acquire() as conn, conn.transaction():
+            await statements.execute(conn, TAG_USAGE_ROLLUP_HOURLY, hour)
+            # Yesterday is recomputed too, for the hours rolled up after midnight.
+            await statements.execute(conn, TAG_USAGE_ROLLUP_DAILY, today - datetime.timedelta(days=1))
+            # The daily rollup needs the hourly rows of the last two days.
+            hourly_cutoff = today - datetime.timedelta(days=max(hourly_retention, 2))
+            await statements.execute(conn, TAG_USAGE_PRUNE_HOURLY, hourly_cutoff)
+            await statements.execute(
+                conn, TAG_USAGE_PRUNE_DAILY, (today - datetime.timedelta(days=daily_retention)).date()
+            )
+
+    async def top_tags(self, guild_id: int, days: int, limit: int = 10) -> list[tuple[str, int]]:
+        """Get the (name, uses) of the guild's most used tags over the last `days`.
+
+        A single day reads the hourly rollup, longer windows the daily one. Uses
+        from the current hour show up once it has been rolled up.
+        """
+        async with self.pool.acquire(readonly=True) as conn:
+            if days <= 1:
+                since = hour_bucket() - datetime.timedelta(hours=24)
+                rows = await statements.fetch(conn, TAG_STATS_HOURLY, guild_id, since, limit)
+            else:
+                since_day = hour_bucket().date() - datetime.timedelta(days=days - 1)
+                rows = await statements.fetch(conn, TAG_STATS_DAILY, guild_id, since_day, limit)
+        return [(row["name"], row["uses"]) for row in rows]
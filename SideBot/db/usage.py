@@ -0,0 +1,90 @@
+"""Write-behind buffer for tag usage counters and events."""
+
+import asyncio
+import contextlib
+import datetime
+import logging
+from collections import Counter
+from collections.abc import Awaitable, Callable
+
+# (guild_id, tag_id, user_id, hour bucket)
+UsageEvent = tuple[int, int, int, datetime.datetime]
+FlushCallback = Callable[[list[int], list[int], list[tuple[UsageEvent, int]]], Awaitable[None]]
+
+
+def hour_bucket(when: datetime.datetime | None = None) -> datetime.datetime:
+    """Return the start of the UTC hour `when` (default now) falls in."""
+    when = when or datetime.datetime.now(tz=datetime.UTC)
+    return when.astimezone(datetime.UTC).replace(minute=0, second=0, microsecond=0)
+
+
+class UsageBuffer:
+    """Buffers tag usage increments and per user, per hour usage events in memory and flushes them in batches."""
+
+    def __init__(self, flush_interval: float = 30.0, max_pending: int = 256) -> None:
+        """Initialize the buffer with the flush interval in seconds and the pending events threshold."""
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.logger = logging.getLogger(__name__)
+        self._used: Counter[int] = Counter()
+        self._events: Counter[UsageEvent] = Counter()
+        self._lock = asyncio.Lock()
+        self._flush_cb: FlushCallback | None = None
+        self._loop_task: asyncio.Task[None] | None = None
+        self._flush_tasks: set[asyncio.Task[None]] = set()
+
+    def __len__(self) -> int:
+        """Return the amount of pending usage events."""
+        return len(self._events)
+
+    def start(self, flush_cb: FlushCallback) -> None:
+        """Start flushing periodically through `flush_cb(tag_ids, counts, events)`."""
+        self._flush_cb = flush_cb
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    def add(self, guild_id: int, tag_id: int, user_id: int, *, counted: bool = False) -> None:
+        """Buffer a use of `tag_id` by `user_id`, flushing early once too many events are pending.
+
+        Set `counted` when the tag's used count was already incremented in the database.
+        """
+        if not counted:
+            self._used[tag_id] += 1
+        self._events[(guild_id, tag_id, user_id, hour_bucket())] += 1
+        if len(self._events) >= self.max_pending and self._flush_cb is not None and not self._lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self) -> None:
+        """Write every buffered increment and event in one batch."""
+        if self._flush_cb is None:
+            return
+        async with self._lock:
+            if not self._events and not self._used:
+                return
+            used, self._used = self._used, Counter()
+            events, self._events = self._events, Counter()
+            try:
+                await self._flush_cb(list(used.keys()), list(used.values()), list(events.items()))
+            except Exception:
+                # Keep the counts around for the next flush instead of dropping them.
+                self._used.update(used)
+                self._events.update(events)
+                self.logger.exception("Failed to flush %s tag usage events", len(events))
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is still buffered."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._loop_task
+            self._loop_task = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
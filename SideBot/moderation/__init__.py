@@ -0,0 +1 @@
+"""moderation state for SideBot."""
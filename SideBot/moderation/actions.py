@@ -0,0 +1,203 @@
+"""A queue that coalesces moderation calls and paces them per rate limit route."""
+
+import asyncio
+import datetime
+import logging
+import time
+from collections.abc import Callable, Coroutine, Hashable, Iterable
+from typing import Any
+
+import discord
+from discord import Forbidden, HTTPException, Member, NotFound, TextChannel
+
+from SideBot.moderation.clean import BULK_DELETE_LIMIT, BULK_DELETE_MAX_AGE
+
+
+class TokenBucket:
+    """Allows `capacity` calls at once and `rate` calls per second after that."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> float:
+        """Add the tokens earned since the last refill and return the amount available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    async def acquire(self) -> None:
+        """Wait for a token and take it."""
+        while self.refill() < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+        self.tokens -= 1
+
+
+class ModerationQueue:
+    """Runs timeouts and message deletions in the background, within per-route budgets.
+
+    Pending timeouts are deduplicated per member, keeping the longest, and
+    members whose applied timeout still has `min_remaining` left (or the
+    requested duration, if shorter) are skipped. Pending
+    deletions are merged per channel into bulk deletes of up to
+    `BULK_DELETE_LIMIT` messages. Every channel and guild is drained by its own
+    task, paced by a token bucket per route, plus a global bucket, so calls stay
+    under Discord's rate limits instead of retrying after 429s.
+    """
+
+    __slots__ = (
+        "budgets",
+        "min_remaining",
+        "logger",
+        "_global",
+        "_buckets",
+        "_deletions",
+        "_timeouts",
+        "_timed_out",
+        "_workers",
+    )
+
+    def __init__(
+        self,
+        global_budget: tuple[float, float] = (45.0, 45.0),
+        bulk_delete_budget: tuple[float, float] = (1.0, 2.0),
+        delete_budget: tuple[float, float] = (1.0, 5.0),
+        timeout_budget: tuple[float, float] = (1.0, 10.0),
+        min_remaining: datetime.timedelta = datetime.timedelta(seconds=10),
+    ) -> None:
+        """Initialize the queue with the (calls per second, burst) budgets of every route."""
+        self.min_remaining = min_remaining
+        self.budgets = {"bulk_delete": bulk_delete_budget, "delete": delete_budget, "timeout": timeout_budget}
+        self.logger = logging.getLogger(__name__)
+        self._global = TokenBucket(*global_budget)
+        # (route, channel or guild id) -> bucket.
+        self._buckets: dict[tuple[str, int], TokenBucket] = {}
+        # channel_id -> (channel, message ids).
+        self._deletions: dict[int, tuple[TextChannel, set[int]]] = {}
+        # guild_id -> member_id -> (member, until, reason).
+        self._timeouts: dict[int, dict[int, tuple[Member, datetime.datetime, str | None]]] = {}
+        # (guild_id, member_id) -> until, for the timeouts applied.
+        self._timed_out: dict[tuple[int, int], datetime.datetime] = {}
+        self._workers: dict[Hashable, asyncio.Task[None]] = {}
+
+    def __repr__(self) -> str:
+        """Return the queue representation."""
+        return f"ModerationQueue(workers={len(self._workers)}, deletions={len(self._deletions)})"
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the amount of pending actions and running workers."""
+        return {
+            "deletions": sum(len(ids) for _, ids in self._deletions.values()),
+            "timeouts": sum(len(members) for members in self._timeouts.values()),
+            "timed_out": len(self._timed_out),
+            "workers": len(self._workers),
+            "buckets": len(self._buckets),
+        }
+
+    def delete(self, channel: TextChannel, message_ids: Iterable[int]) -> None:
+        """Queue the deletion of messages in `channel`."""
+        pending = self._deletions.get(channel.id)
+        if pending is None:
+            pending = self._deletions[channel.id] = (channel, set())
+        pending[1].update(message_ids)
+        self._ensure_worker(("channel", channel.id), lambda: self._drain_channel(channel.id))
+
+    def timeout(self, member: Member, duration: datetime.timedelta, reason: str | None = None) -> None:
+        """Queue a timeout of `member` for `duration`, unless one is pending or still applied."""
+        now = discord.utils.utcnow()
+        until = now + duration
+        applied = self._timed_out.get((member.guild.id, member.id))
+        # Requests for a fixed duration always end later, so compare the time left instead.
+        if applied is not None and applied - now >= min(duration, self.min_remaining):
+            return
+        pending = self._timeouts.setdefault(member.guild.id, {})
+        current = pending.get(member.id)
+        if current is None or current[1] < until:
+            pending[member.id] = (member, until, reason)
+        self._ensure_worker(("guild", member.guild.id), lambda: self._drain_guild(member.guild.id))
+
+    def prune(self) -> None:
+        """Drop the expired timeouts and the buckets of idle routes."""
+        now = discord.utils.utcnow()
+        self._timed_out = {key: until for key, until in self._timed_out.items() if until > now}
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket.refill() < bucket.capacity}
+
+    async def stop(self) -> None:
+        """Cancel the workers, dropping whatever is still pending."""
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+        self._deletions.clear()
+        self._timeouts.clear()
+
+    def _ensure_worker(self, key: Hashable, drain: Callable[[], Coroutine[Any, Any, None]]) -> None:
+        worker = self._workers.get(key)
+        if worker is not None and not worker.done():
+            return
+        worker = self._workers[key] = asyncio.create_task(drain())
+        worker.add_done_callback(lambda task: self._worker_done(key, task))
+
+    def _worker_done(self, key: Hashable, task: asyncio.Task[None]) -> None:
+        if self._workers.get(key) is task:
+            del self._workers[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error("Moderation worker %s failed", key, exc_info=task.exception())
+
+    async def _wait(self, route: str, target_id: int) -> None:
+        bucket = self._buckets.get((route, target_id))
+        if bucket is None:
+            bucket = self._buckets[route, target_id] = TokenBucket(*self.budgets[route])
+        await bucket.acquire()
+        await self._global.acquire()
+
+    async def _drain_channel(self, channel_id: int) -> None:
+        while True:
+            pending = self._deletions.get(channel_id)
+            if pending is None:
+                return
+            channel, ids = pending
+            if not ids:
+                del self._deletions[channel_id]
+                return
+            batch = [ids.pop() for _ in range(min(BULK_DELETE_LIMIT, len(ids)))]
+            cutoff = discord.utils.time_snowflake(discord.utils.utcnow() - BULK_DELETE_MAX_AGE)
+            recent = [discord.Object(i) for i in batch if i >= cutoff]
+            if recent:
+                await self._wait("bulk_delete" if len(recent) > 1 else "delete", channel_id)
+                try:
+                    await channel.delete_messages(recent)
+                except (Forbidden, HTTPException) as e:
+                    self.logger.warning("Could not delete %s messages in %s: %s", len(recent), channel, e)
+            for message_id in batch:
+                if message_id >= cutoff:
+                    continue
+                await self._wait("delete", channel_id)
+                try:
+                    await channel.get_partial_message(message_id).delete()
+                except NotFound:
+                    continue
+                except (Forbidden, HTTPException) as e:
+                    self.logger.warning("Could not delete message %s in %s: %s", message_id, channel, e)
+
+    async def _drain_guild(self, guild_id: int) -> None:
+        while pending := self._timeouts.get(guild_id):
+            member_id, (member, until, reason) = pending.popitem()
+            if not pending:
+                del self._timeouts[guild_id]
+            # Count it as applied right away, so it is not queued again while waiting for the budget.
+            self._timed_out[guild_id, member_id] = until
+            await self._wait("timeout", guild_id)
+            try:
+                await member.timeout(until, reason=reason)
+            except (Forbidden, HTTPException) as e:
+                self.logger.warning("Could not time out %s: %s", member, e)
+                self._timed_out.pop((guild_id, member_id), None)
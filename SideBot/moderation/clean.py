@@ -0,0 +1,168 @@
+"""Concurrent message cleanup across channels."""
+
+import asyncio
+import dataclasses
+import datetime
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+
+import discord
+from discord import Forbidden, HTTPException, NotFound, TextChannel
+
+from SideBot.moderation.history import MessageHistory
+
+BULK_DELETE_LIMIT = 100
+# Bulk deletes reject messages older than two weeks, keep a margin for the time a cleanup takes.
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+
+
+@dataclasses.dataclass(slots=True)
+class CleanProgress:
+    """How far a cleanup got."""
+
+    channels: int
+    scanned: int = 0
+    deleted: int = 0
+    failed: int = 0
+
+
+ProgressCallback = Callable[[CleanProgress], Awaitable[None]]
+
+
+class CleanJob:
+    """Deletes up to `count` messages, optionally from a single member, across channels.
+
+    Channels are scanned `concurrency` at a time and share the `count` budget.
+    Recent messages are bulk deleted `BULK_DELETE_LIMIT` at a time as they are
+    found, older ones are deleted one by one. Rate limits are left to the
+    discord.py HTTP client, the concurrency bound keeps it from queueing up.
+    """
+
+    __slots__ = (
+        "channels",
+        "remaining",
+        "member_id",
+        "scan_limit",
+        "history",
+        "concurrency",
+        "on_progress",
+        "progress_interval",
+        "progress",
+        "logger",
+        "_reported_at",
+    )
+
+    def __init__(
+        self,
+        channels: Sequence[TextChannel],
+        count: int,
+        *,
+        member_id: int | None = None,
+        scan_limit: int = 200,
+        history: MessageHistory | None = None,
+        concurrency: int = 4,
+        on_progress: ProgressCallback | None = None,
+        progress_interval: float = 2.0,
+    ) -> None:
+        """Initialize the job, scanning up to `scan_limit` messages per channel when filtering by member.
+
+        Messages are picked from `history` when it reaches back far enough, without fetching the channel history.
+        """
+        self.channels = channels
+        self.remaining = count
+        self.member_id = member_id
+        self.scan_limit = scan_limit
+        self.history = history
+        self.concurrency = concurrency
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.progress = CleanProgress(len(channels))
+        self.logger = logging.getLogger(__name__)
+        self._reported_at = 0.0
+
+    async def run(self) -> CleanProgress:
+        """Clean every channel and return the final progress, which is not reported through `on_progress`."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(channel: TextChannel) -> None:
+            async with semaphore:
+                if self.remaining > 0:
+                    await self._clean_channel(channel)
+            self.progress.scanned += 1
+            await self._report()
+
+        await asyncio.gather(*(worker(channel) for channel in self.channels))
+        return self.progress
+
+    async def _clean_channel(self, channel: TextChannel) -> None:
+        # Every message matches without a member, so there is no point in scanning further than the budget.
+        limit = self.scan_limit if self.member_id is not None else self.remaining
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        recent: list[discord.PartialMessage] = []
+        old: list[discord.PartialMessage] = []
+        try:
+            async for message in self._scan(channel, limit):
+                if self.remaining <= 0:
+                    break
+                self.remaining -= 1
+                if message.created_at < cutoff:
+                    old.append(message)
+                    continue
+                recent.append(message)
+                if len(recent) == BULK_DELETE_LIMIT:
+                    await self._bulk_delete(channel, recent)
+                    recent = []
+        except (Forbidden, HTTPException) as e:
+            self.logger.warning("Could not read the history of %s: %s", channel, e)
+        await self._bulk_delete(channel, recent)
+        for message in old:
+            await self._delete(message)
+
+    async def _scan(self, channel: TextChannel, limit: int) -> AsyncIterator[discord.PartialMessage]:
+        # The messages to delete, newest first, from the local history when it reaches back far enough.
+        if self.history is not None:
+            ids = self.history.recent(channel.id, self.remaining, limit, self.member_id)
+            if ids is not None:
+                for message_id in ids:
+                    yield channel.get_partial_message(message_id)
+                return
+        async for message in channel.history(limit=limit):
+            if self.member_id is None or message.author.id == self.member_id:
+                yield message
+
+    async def _bulk_delete(self, channel: TextChannel, messages: list[discord.PartialMessage]) -> None:
+        if not messages:
+            return
+        try:
+            await channel.delete_messages(messages)
+        except (Forbidden, HTTPException) as e:
+            self.logger.warning("Could not delete %s messages in %s: %s", len(messages), channel, e)
+            self.progress.failed += len(messages)
+        else:
+            self.progress.deleted += len(messages)
+        await self._report()
+
+    async def _delete(self, message: discord.PartialMessage) -> None:
+        try:
+            await message.delete()
+        except NotFound:
+            return
+        except (Forbidden, HTTPException) as e:
+            self.logger.warning("Could not delete message %s: %s", message.id, e)
+            self.progress.failed += 1
+        else:
+            self.progress.deleted += 1
+        await self._report()
+
+    async def _report(self) -> None:
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if now - self._reported_at < self.progress_interval:
+            return
+        self._reported_at = now
+        try:
+            await self.on_progress(self.progress)
+        except HTTPException as e:
+            self.logger.warning("Could not report cleanup progress: %s", e)
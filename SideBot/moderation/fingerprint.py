@@ -0,0 +1,347 @@
+"""Duplicate content detection over a bounded, time-decayed sketch of message fingerprints.
+
+Messages are normalized and fingerprinted twice: an exact hash, and a 64 bit
+SimHash of their character shingles for near duplicates. A SimHash is indexed
+by its eight 8 bit bands, so any fingerprint within `MAX_DISTANCE` bits shares
+at least one band with it and is found with eight dict lookups. Bands belong to
+the fingerprint that last used them, so the content of an ongoing raid keeps
+its bands.
+"""
+
+import dataclasses
+import hashlib
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict, deque
+from collections.abc import Hashable
+from typing import TypeVar
+
+from SideBot.moderation.memory import deep_sizeof
+
+SHINGLE = 4
+MAX_SHINGLES = 1024
+BANDS = 8
+BAND_BITS = 64 // BANDS
+MAX_DISTANCE = BANDS - 1
+
+K = TypeVar("K", bound=Hashable)
+
+MENTION = re.compile(r"<(?:@[!&]?|#)\d+>")
+INVITE = re.compile(r"(?:discord(?:app)?\.com/invite|discord\.gg)/", re.IGNORECASE)
+
+# byte -> its 8 bits spread 16 bits apart, to add up the bit votes of a whole hash at once.
+_SPREAD = [sum(1 << (16 * bit) for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def normalize(content: str) -> str:
+    """Return `content` casefolded without mentions, punctuation, invisible characters or extra whitespace."""
+    text = MENTION.sub(" ", unicodedata.normalize("NFKC", content).casefold())
+    words = ("".join(c for c in word if unicodedata.category(c)[0] in "LNS") for word in text.split())
+    return " ".join(word for word in words if word)
+
+
+def exact_hash(text: str) -> int:
+    """Return a 64 bit hash of `text`."""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def simhash(text: str) -> int:
+    """Return the 64 bit SimHash of the character shingles of `text`."""
+    shingles = {text[i : i + SHINGLE] for i in range(max(1, min(len(text), MAX_SHINGLES) - SHINGLE + 1))}
+    votes = 0
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode(), digest_size=8).digest()
+        for i, byte in enumerate(digest):
+            votes += _SPREAD[byte] << (128 * i)
+    result = 0
+    for bit in range(64):
+        if ((votes >> (16 * bit)) & 0xFFFF) * 2 > len(shingles):
+            result |= 1 << bit
+    return result
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class DuplicateContent:
+    """Copies of the same content that were found to be spam."""
+
+    users: int
+    channels: int
+    # (user_id, channel_id, message_id) of the copies not reported before.
+    messages: tuple[tuple[int, int, int], ...]
+    # Whether many users posted it, rather than one user in many channels.
+    raid: bool = False
+
+
+class _Fingerprint:
+    """The recent copies of one piece of content."""
+
+    __slots__ = (
+        "simhash",
+        "last_seen",
+        "copies",
+        "users",
+        "channels",
+        "pairs",
+        "user_channels",
+        "flagged_users",
+        "raid_until",
+    )
+
+    def __init__(self, simhash: int) -> None:
+        """Initialize an empty fingerprint with its SimHash."""
+        self.simhash = simhash
+        self.last_seen = 0.0
+        # (monotonic time, user_id, channel_id, message_id, from a new account), oldest first.
+        self.copies: deque[tuple[float, int, int, int, bool]] = deque()
+        self.users: Counter[int] = Counter()
+        self.channels: Counter[int] = Counter()
+        self.pairs: Counter[tuple[int, int]] = Counter()
+        # user_id -> amount of distinct channels they posted this in.
+        self.user_channels: Counter[int] = Counter()
+        # Users already reported for posting this in too many channels.
+        self.flagged_users: set[int] = set()
+        # Monotonic time until which every copy is part of a reported raid.
+        self.raid_until = 0.0
+
+    def add(self, when: float, user_id: int, channel_id: int, message_id: int, new_account: bool) -> None:  # noqa: FBT001
+        """Count a copy."""
+        self.last_seen = when
+        self.copies.append((when, user_id, channel_id, message_id, new_account))
+        self.users[user_id] += 1
+        self.channels[channel_id] += 1
+        self.pairs[user_id, channel_id] += 1
+        if self.pairs[user_id, channel_id] == 1:
+            self.user_channels[user_id] += 1
+
+    def expire(self, cutoff: float, max_copies: int) -> None:
+        """Drop the copies older than `cutoff`, and the oldest ones beyond `max_copies`."""
+        copies = self.copies
+        while copies and (copies[0][0] < cutoff or len(copies) > max_copies):
+            _, user_id, channel_id, _, _ = copies.popleft()
+            _decrement(self.users, user_id)
+            _decrement(self.channels, channel_id)
+            if not _decrement(self.pairs, (user_id, channel_id)):
+                _decrement(self.user_channels, user_id)
+        if not copies:
+            self.flagged_users.clear()
+
+
+def _decrement(counter: Counter[K], key: K) -> int:
+    counter[key] -= 1
+    count = counter[key]
+    if not count:
+        del counter[key]
+    return count
+
+
+class _GuildSketch:
+    """The fingerprints of a guild, least recently seen first, and their band index."""
+
+    __slots__ = ("entries", "bands")
+
+    def __init__(self) -> None:
+        """Initialize an empty guild sketch."""
+        # exact hash -> fingerprint.
+        self.entries: OrderedDict[int, _Fingerprint] = OrderedDict()
+        # (band number, band value) -> exact hash of the fingerprint that last used the band.
+        self.bands: dict[tuple[int, int], int] = {}
+
+    def nearest(self, value: int) -> tuple[int, _Fingerprint] | None:
+        """Return the exact hash and fingerprint within `MAX_DISTANCE` bits of the SimHash `value`, if any."""
+        for band in _bands_of(value):
+            exact = self.bands.get(band)
+            entry = self.entries.get(exact) if exact is not None else None
+            if exact is not None and entry is not None and (entry.simhash ^ value).bit_count() <= MAX_DISTANCE:
+                return exact, entry
+        return None
+
+    def evict(self) -> None:
+        """Drop the least recently seen fingerprint."""
+        exact, entry = self.entries.popitem(last=False)
+        for band in _bands_of(entry.simhash):
+            if self.bands.get(band) == exact:
+                del self.bands[band]
+
+    def prune(self, cutoff: float) -> None:
+        """Drop the fingerprints last seen before `cutoff`."""
+        # The least recently seen fingerprint is first, stop at the first one still in the window.
+        while self.entries and next(iter(self.entries.values())).last_seen < cutoff:
+            self.evict()
+
+
+def _bands_of(value: int) -> list[tuple[int, int]]:
+    mask = (1 << BAND_BITS) - 1
+    return [(band, (value >> (band * BAND_BITS)) & mask) for band in range(BANDS)]
+
+
+class FingerprintSketch:
+    """Tracks which users posted the same or nearly the same content in which channels.
+
+    Content is spam once a single user posted it in `channels_max` channels
+    within `window` seconds, or `users_max` users posted it within the much
+    shorter `raid_window` with a raid signal: the content is an invite, every
+    poster has a new account, or, as established accounts often ask the same
+    thing during an outage, the copies span `raid_channels` channels (default
+    `channels_max`). A burst of common text in one channel, like a popular
+    question, is never spam on its own. Each guild keeps at most `max_entries`
+    fingerprints with `max_copies` copies each, the least recently seen are
+    evicted first, so memory stays bounded during raids.
+    """
+
+    __slots__ = (
+        "window",
+        "channels_max",
+        "users_max",
+        "raid_window",
+        "raid_channels",
+        "min_length",
+        "max_entries",
+        "max_copies",
+        "evictions",
+        "_guilds",
+    )
+
+    def __init__(
+        self,
+        window: float = 1800.0,
+        channels_max: int = 4,
+        users_max: int = 5,
+        raid_window: float = 120.0,
+        raid_channels: int | None = None,
+        min_length: int = 16,
+        max_entries: int = 1024,
+        max_copies: int = 32,
+    ) -> None:
+        """Initialize the sketch with the detection thresholds and the per-guild size limits."""
+        self.window = window
+        self.channels_max = channels_max
+        self.users_max = users_max
+        self.raid_window = raid_window
+        self.raid_channels = channels_max if raid_channels is None else raid_channels
+        self.min_length = min_length
+        self.max_entries = max_entries
+        self.max_copies = max_copies
+        self.evictions = 0
+        self._guilds: dict[int, _GuildSketch] = {}
+
+    def __len__(self) -> int:
+        """Return the amount of tracked fingerprints across every guild."""
+        return sum(len(guild.entries) for guild in self._guilds.values())
+
+    def __repr__(self) -> str:
+        """Return the sketch representation."""
+        return f"FingerprintSketch(window={self.window}, guilds={len(self._guilds)}, entries={len(self)})"
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the entry counts and the approximate bytes used."""
+        return {
+            "guilds": len(self._guilds),
+            "fingerprints": len(self),
+            "copies": sum(len(entry.copies) for guild in self._guilds.values() for entry in guild.entries.values()),
+            "evictions": self.evictions,
+            "bytes": deep_sizeof(self._guilds),
+        }
+
+    def record(
+        self,
+        guild_id: int,
+        user_id: int,
+        channel_id: int,
+        message_id: int,
+        content: str,
+        now: float | None = None,
+        *,
+        new_account: bool = False,
+    ) -> DuplicateContent | None:
+        """Record a message, returning the copies to act on if its content is spam.
+
+        Set `new_account` when the author's account was created recently.
+        """
+        text = normalize(content)
+        if len(text) < self.min_length:
+            return None
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = self._guilds[guild_id] = _GuildSketch()
+        guild.prune(cutoff)
+        exact = exact_hash(text)
+        entry = guild.entries.get(exact)
+        if entry is None:
+            value = simhash(text)
+            nearest = guild.nearest(value)
+            if nearest is None:
+                entry = guild.entries[exact] = _Fingerprint(value)
+            else:
+                exact, entry = nearest
+        guild.entries.move_to_end(exact)
+        for band in _bands_of(entry.simhash):
+            guild.bands[band] = exact
+        while len(guild.entries) > self.max_entries:
+            guild.evict()
+            self.evictions += 1
+        entry.expire(cutoff, self.max_copies - 1)
+        entry.add(now, user_id, channel_id, message_id, new_account)
+        raiding = now < entry.raid_until
+        if raiding:
+            # Every copy keeps an ongoing raid going.
+            entry.raid_until = now + self.raid_window
+        if raiding or user_id in entry.flagged_users:
+            return DuplicateContent(
+                len(entry.users),
+                len(entry.channels),
+                ((user_id, channel_id, message_id),),
+                raid=raiding and user_id not in entry.flagged_users,
+            )
+        if entry.user_channels[user_id] >= self.channels_max:
+            entry.flagged_users.add(user_id)
+            return DuplicateContent(
+                len(entry.users),
+                len(entry.channels),
+                tuple((user, channel, message) for _, user, channel, message, _ in entry.copies if user == user_id),
+            )
+        raid = self._raid_copies(entry, now - self.raid_window, invite=INVITE.search(content) is not None)
+        if raid is None:
+            return None
+        entry.raid_until = now + self.raid_window
+        return DuplicateContent(
+            len({user for user, _, _ in raid}),
+            len({channel for _, channel, _ in raid}),
+            raid,
+            raid=True,
+        )
+
+    def _raid_copies(
+        self, entry: _Fingerprint, cutoff: float, *, invite: bool
+    ) -> tuple[tuple[int, int, int], ...] | None:
+        # At most `max_copies` copies are looked at, newest first.
+        copies = []
+        users: set[int] = set()
+        channels: set[int] = set()
+        established = False
+        for when, user, channel, message, new_account in reversed(entry.copies):
+            if when < cutoff:
+                break
+            if user in entry.flagged_users:
+                # Already reported for cross posting, their channels say nothing about the others.
+                continue
+            copies.append((user, channel, message))
+            users.add(user)
+            channels.add(channel)
+            established = established or not new_account
+        if len(users) < self.users_max:
+            return None
+        if len(channels) < self.raid_channels and not invite and established:
+            return None
+        return tuple(reversed(copies))
+
+    def sweep(self, now: float | None = None) -> None:
+        """Drop the fingerprints of every guild no longer seen within the window, and the guilds left empty."""
+        cutoff = (time.monotonic() if now is None else now) - self.window
+        for guild_id, guild in list(self._guilds.items()):
+            guild.prune(cutoff)
+            if not guild.entries:
+                del self._guilds[guild_id]
@@ -0,0 +1,127 @@
+"""Recent message history per channel, kept from the gateway message stream.
+
+Each channel holds a ring of its last messages as two compact arrays of
+message and author ids. The timestamp of a message is not stored, it is part
+of its snowflake id. Deleted messages stay in the ring with author 0.
+"""
+
+import bisect
+from array import array
+from collections.abc import Iterable, Iterator
+
+from SideBot.moderation.memory import deep_sizeof
+
+
+class _ChannelRing:
+    """The last messages of a channel, oldest at `start`."""
+
+    __slots__ = ("ids", "authors", "start")
+
+    def __init__(self) -> None:
+        """Initialize an empty ring."""
+        self.ids = array("Q")
+        self.authors = array("Q")
+        self.start = 0
+
+    def __len__(self) -> int:
+        """Return the amount of messages in the ring."""
+        return len(self.ids)
+
+    def append(self, message_id: int, author_id: int, capacity: int) -> None:
+        """Add a message, overwriting the oldest one once `capacity` messages are held."""
+        if len(self.ids) < capacity:
+            self.ids.append(message_id)
+            self.authors.append(author_id)
+            return
+        self.ids[self.start] = message_id
+        self.authors[self.start] = author_id
+        self.start = (self.start + 1) % len(self.ids)
+
+    def newest_first(self) -> Iterator[tuple[int, int]]:
+        """Yield the (message_id, author_id) of every message, newest first."""
+        ids, authors, size = self.ids, self.authors, len(self.ids)
+        for k in range(size):
+            i = (self.start - 1 - k) % size
+            yield ids[i], authors[i]
+
+    def forget(self, message_id: int) -> None:
+        """Mark a message as deleted."""
+        size = len(self.ids)
+        # Ids grow with time, so the ring read from `start` is sorted.
+        k = bisect.bisect_left(range(size), message_id, key=lambda k: self.ids[(self.start + k) % size])
+        i = (self.start + k) % size if size else 0
+        if k < size and self.ids[i] == message_id:
+            self.authors[i] = 0
+
+
+class MessageHistory:
+    """The last `capacity` messages of every channel messages were seen in."""
+
+    __slots__ = ("capacity", "_channels")
+
+    def __init__(self, capacity: int = 500) -> None:
+        """Initialize an empty history keeping `capacity` messages per channel."""
+        self.capacity = capacity
+        self._channels: dict[int, _ChannelRing] = {}
+
+    def __len__(self) -> int:
+        """Return the amount of messages held across every channel."""
+        return sum(len(ring) for ring in self._channels.values())
+
+    def __repr__(self) -> str:
+        """Return the history representation."""
+        return f"MessageHistory(capacity={self.capacity}, channels={len(self._channels)}, messages={len(self)})"
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the entry counts and the approximate bytes used."""
+        return {
+            "channels": len(self._channels),
+            "messages": len(self),
+            "bytes": deep_sizeof(self._channels),
+        }
+
+    def record(self, channel_id: int, message_id: int, author_id: int) -> None:
+        """Record a new message."""
+        ring = self._channels.get(channel_id)
+        if ring is None:
+            ring = self._channels[channel_id] = _ChannelRing()
+        ring.append(message_id, author_id, self.capacity)
+
+    def forget(self, channel_id: int, message_ids: Iterable[int]) -> None:
+        """Mark deleted messages."""
+        ring = self._channels.get(channel_id)
+        if ring is not None:
+            for message_id in message_ids:
+                ring.forget(message_id)
+
+    def drop(self, channel_id: int) -> None:
+        """Forget a channel."""
+        self._channels.pop(channel_id, None)
+
+    def clear(self) -> None:
+        """Forget every channel, when messages may have been missed."""
+        self._channels.clear()
+
+    def recent(self, channel_id: int, limit: int, horizon: int, author_id: int | None = None) -> list[int] | None:
+        """Return the ids of the newest `limit` messages, by `author_id` if given, among the last `horizon`.
+
+        Deleted messages don't count toward `horizon`, as the channel history would
+        not return them either. Returns None when the answer is not known locally,
+        that is when fewer than `limit` messages matched and the ring holds fewer
+        than `horizon` messages that were not deleted.
+        """
+        ring = self._channels.get(channel_id)
+        if ring is None:
+            return None
+        found: list[int] = []
+        scanned = 0
+        for message_id, author in ring.newest_first():
+            if len(found) >= limit or scanned >= horizon:
+                return found
+            if not author:
+                continue
+            scanned += 1
+            if author_id is None or author == author_id:
+                found.append(message_id)
+        return found if len(found) >= limit or scanned >= horizon else None
@@ -0,0 +1,30 @@
+"""Approximate memory accounting for moderation state."""
+
+import sys
+from array import array
+from collections.abc import Collection, Mapping
+
+
+def deep_sizeof(obj: object) -> int:
+    """Return the approximate bytes used by `obj` and everything it references, counting shared objects once."""
+    seen: set[int] = set()
+    pending = [obj]
+    size = 0
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        # Arrays hold their items inline.
+        if isinstance(current, str | bytes | int | float | array):
+            continue
+        if isinstance(current, Mapping):
+            pending.extend(current.keys())
+            pending.extend(current.values())
+        elif isinstance(current, Collection):
+            pending.extend(current)
+        for slot in getattr(type(current), "__slots__", ()):
+            if hasattr(current, slot):
+                pending.append(getattr(current, slot))
+    return size
@@ -0,0 +1,151 @@
+"""Sliding window tracking of the channels members recently posted in."""
+
+import time
+from collections import Counter, OrderedDict, deque
+
+from SideBot.moderation.memory import deep_sizeof
+
+
+class _MemberActivity:
+    """The messages a member sent within the window, oldest first."""
+
+    __slots__ = ("messages", "channels")
+
+    def __init__(self) -> None:
+        """Initialize an empty activity record."""
+        # (monotonic time, channel_id, message_id)
+        self.messages: deque[tuple[float, int, int]] = deque()
+        # channel_id -> amount of messages in `messages`.
+        self.channels: Counter[int] = Counter()
+
+    def drop_oldest(self) -> None:
+        """Drop the oldest message."""
+        _, channel_id, _ = self.messages.popleft()
+        self.channels[channel_id] -= 1
+        if not self.channels[channel_id]:
+            del self.channels[channel_id]
+
+    def expire(self, cutoff: float) -> int:
+        """Drop the messages sent before `cutoff`, returning how many were dropped."""
+        dropped = 0
+        while self.messages and self.messages[0][0] < cutoff:
+            self.drop_oldest()
+            dropped += 1
+        return dropped
+
+
+class _GuildActivity:
+    """The members of a guild ordered by their last message, least recent first."""
+
+    __slots__ = ("members", "messages")
+
+    def __init__(self) -> None:
+        """Initialize an empty guild record."""
+        self.members: OrderedDict[int, _MemberActivity] = OrderedDict()
+        # Amount of messages across every member.
+        self.messages = 0
+
+
+class SpamTracker:
+    """Per-guild, per-member sliding window of recent messages.
+
+    Members are kept ordered by their last message, so idle members are
+    dropped from the front as the window slides. Every operation is O(1)
+    amortized, whatever the amount of active members.
+
+    Each guild tracks at most `max_members` members and `max_messages`
+    messages, the least recently active members are evicted first.
+    """
+
+    __slots__ = ("window", "max_members", "max_messages", "evictions", "_guilds")
+
+    def __init__(self, window: float = 1800.0, max_members: int = 1024, max_messages: int = 4096) -> None:
+        """Initialize the tracker with the `window` length in seconds and the per-guild limits."""
+        self.window = window
+        self.max_members = max_members
+        self.max_messages = max_messages
+        self.evictions = 0
+        self._guilds: dict[int, _GuildActivity] = {}
+
+    def __len__(self) -> int:
+        """Return the amount of tracked members across every guild."""
+        return sum(len(guild.members) for guild in self._guilds.values())
+
+    def __repr__(self) -> str:
+        """Return the tracker representation."""
+        return f"SpamTracker(window={self.window}, guilds={len(self._guilds)}, members={len(self)})"
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return the entry counts and the approximate bytes used."""
+        return {
+            "guilds": len(self._guilds),
+            "members": len(self),
+            "messages": sum(guild.messages for guild in self._guilds.values()),
+            "evictions": self.evictions,
+            "bytes": deep_sizeof(self._guilds),
+        }
+
+    def record(self, guild_id: int, member_id: int, channel_id: int, message_id: int, now: float | None = None) -> int:
+        """Record a message and return the amount of channels the member posted in within the window."""
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = self._guilds[guild_id] = _GuildActivity()
+        activity = guild.members.get(member_id)
+        if activity is None:
+            activity = guild.members[member_id] = _MemberActivity()
+        else:
+            guild.members.move_to_end(member_id)
+            guild.messages -= activity.expire(cutoff)
+        activity.messages.append((now, channel_id, message_id))
+        activity.channels[channel_id] += 1
+        guild.messages += 1
+        self._prune(guild, cutoff)
+        self._evict(guild, activity)
+        return len(activity.channels)
+
+    def pop(self, guild_id: int, member_id: int) -> dict[int, list[int]]:
+        """Stop tracking a member, returning their message ids within the window by channel id."""
+        guild = self._guilds.get(guild_id)
+        if guild is None or member_id not in guild.members:
+            return {}
+        activity = guild.members.pop(member_id)
+        guild.messages -= len(activity.messages)
+        if not guild.members:
+            del self._guilds[guild_id]
+        activity.expire(time.monotonic() - self.window)
+        by_channel: dict[int, list[int]] = {}
+        for _, channel_id, message_id in activity.messages:
+            by_channel.setdefault(channel_id, []).append(message_id)
+        return by_channel
+
+    def sweep(self, now: float | None = None) -> None:
+        """Drop the idle members of every guild, and the guilds left empty."""
+        cutoff = (time.monotonic() if now is None else now) - self.window
+        for guild_id, guild in list(self._guilds.items()):
+            self._prune(guild, cutoff)
+            if not guild.members:
+                del self._guilds[guild_id]
+
+    def _prune(self, guild: _GuildActivity, cutoff: float) -> None:
+        # The least recently active member is first, stop at the first one still in the window.
+        while guild.members:
+            member_id, activity = next(iter(guild.members.items()))
+            if activity.messages and activity.messages[-1][0] >= cutoff:
+                return
+            del guild.members[member_id]
+            guild.messages -= len(activity.messages)
+
+    def _evict(self, guild: _GuildActivity, current: _MemberActivity) -> None:
+        while len(guild.members) > self.max_members or guild.messages > self.max_messages:
+            member_id, activity = next(iter(guild.members.items()))
+            if activity is current:
+                # The only member left, keep their most recent messages.
+                activity.drop_oldest()
+                guild.messages -= 1
+                continue
+            del guild.members[member_id]
+            guild.messages -= len(activity.messages)
+            self.evictions += 1
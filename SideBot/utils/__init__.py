@@ -1,5 +1,7 @@
 """utilites for SideBot."""
 
+import dataclasses
+
 import discord
 
 
@@ -40,31 +42,145 @@ class DBConfig:
         )
 
 
+class PoolConfig:
+    """PoolConfig class for the Postgresql connection pool"""
+
+    __slots__ = ("min_size", "max_size", "acquire_timeout", "prepared_statements", "health_check_interval")
+
+    def __init__(
+        self,
+        min_size: int = 2,
+        max_size: int = 10,
+        acquire_timeout: float | None = 10.0,
+        prepared_statements: bool = True,
+        health_check_interval: float = 10.0,
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.prepared_statements = prepared_statements
+        self.health_check_interval = health_check_interval
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PoolConfig":
+        return cls(
+            data.get("minSize", 2),
+            data.get("maxSize", 10),
+            data.get("acquireTimeout", 10.0),
+            data.get("preparedStatements", True),
+            data.get("healthCheckInterval", 10.0),
+        )
+
+
+class CacheConfig:
+    """CacheConfig class for the in-process tag cache"""
+
+    __slots__ = ("max_entries", "ttl")
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CacheConfig":
+        return cls(
+            data.get("maxEntries", 1024),
+            data.get("ttl", 300.0),
+        )
+
+
+class UsageConfig:
+    """UsageConfig class for the buffered tag usage counters and usage stats"""
+
+    __slots__ = ("flush_interval", "max_pending", "hourly_retention", "daily_retention")
+
+    def __init__(
+        self,
+        flush_interval: float = 30.0,
+        max_pending: int = 256,
+        hourly_retention: int = 14,
+        daily_retention: int = 365,
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.hourly_retention = hourly_retention
+        self.daily_retention = daily_retention
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UsageConfig":
+        return cls(
+            data.get("flushInterval", 30.0),
+            data.get("maxPending", 256),
+            data.get("hourlyRetention", 14),
+            data.get("dailyRetention", 365),
+        )
+
+
 class BotConfig:
     """BotConfig class for SideBot"""
 
-    __slots__ = ("token", "owner", "db_url", "cogs")
-
-    def __init__(self, token: str, owner: int, db_url: str, cogs: list[str]):
+    __slots__ = ("token", "owner", "db_url", "cogs", "pool", "tag_cache", "tag_usage", "tag_snapshot", "replica_urls")
+
+    def __init__(
+        self,
+        token: str,
+        owner: int,
+        db_url: str,
+        cogs: list[str],
+        pool: PoolConfig | None = None,
+        tag_cache: CacheConfig | None = None,
+        tag_usage: UsageConfig | None = None,
+        tag_snapshot: str | None = None,
+        replica_urls: list[str] | None = None,
+    ):
         self.token = token
         self.owner = owner
         self.db_url = db_url
         self.cogs = cogs
+        self.pool = pool or PoolConfig()
+        self.tag_cache = tag_cache or CacheConfig()
+        self.tag_usage = tag_usage or UsageConfig()
+        self.tag_snapshot = tag_snapshot
+        self.replica_urls = replica_urls or []
 
     @classmethod
     def from_dict(cls, data: dict) -> "BotConfig":
+        pool = PoolConfig.from_dict(data.get("botDBPool", {}))
+        tag_cache = CacheConfig.from_dict(data.get("tagCache", {}))
+        tag_usage = UsageConfig.from_dict(data.get("tagUsage", {}))
+        tag_snapshot = data.get("tagSnapshot")
+        replica_urls = data.get("botDBReplicaURLs", [])
         if "botDB" in data:
-            return cls(data["discordToken"], data["owner"], DBConfig.from_dict(data["botDB"]).connect_str, data["cogs"])
-        return cls(data["discordToken"], data["owner"], data["botDBURL"], data["cogs"])
+            return cls(
+                data["discordToken"],
+                data["owner"],
+                DBConfig.from_dict(data["botDB"]).connect_str,
+                data["cogs"],
+                pool,
+                tag_cache,
+                tag_usage,
+                tag_snapshot,
+                replica_urls,
+            )
+        return cls(
+            data["discordToken"],
+            data["owner"],
+            data["botDBURL"],
+            data["cogs"],
+            pool,
+            tag_cache,
+            tag_usage,
+            tag_snapshot,
+            replica_urls,
+        )
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
 class DiscordUser:
     """DiscordUser class."""
 
-    def __init__(self, iden: int, name: str) -> None:
-        """DiscordUser class."""
-        self.id = iden
-        self.name = name
+    id: int
+    name: str
 
     def to_tuple(self) -> tuple[int, str]:
         """Convert to tuple."""
@@ -81,13 +197,12 @@ class DiscordUser:
         return cls(user.id, user.name)
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
 class ButtonLink:
     """ButtonLink class."""
 
-    def __init__(self, label: str, url: str) -> None:
-        """ButtonLink class."""
-        self.label = label
-        self.url = url
+    label: str
+    url: str
 
     @classmethod
     def to_tuple(cls, button: "ButtonLink") -> tuple[str, str]:
@@ -0,0 +1,97 @@
+"""Micro-benchmark for the tag query statement registry.
+
+Both modes use asyncpg's default per-connection statement cache, as the bot
+did before the registry existed, so a query is prepared on its first use on a
+connection and reused after that. The registry only moves that preparation to
+connection init. The benchmark therefore reports, per mode:
+
+- connect: opening a connection and running `init_connection`
+- first: the first tag lookup on a fresh connection
+- steady: lookups on a connection once the statement is cached
+
+Usage: SIDEBOT_BENCH_DSN=postgresql://... python -m benchmarks.statements
+"""
+
+import asyncio
+import os
+import statistics
+import time
+
+import asyncpg
+
+from SideBot.db.migrations import migrate
+from SideBot.db.pool import init_connection
+from SideBot.db.statements import statements
+from SideBot.db.tags import TAG_GET
+from SideBot.utils import DiscordUser
+
+BENCH_GUILD = -1
+TAG_COUNT = 1000
+ITERATIONS = 5000
+CONNECTIONS = 50
+
+
+async def run(conn: asyncpg.Connection) -> list[float]:
+    """Time `ITERATIONS` tag lookups on `conn`, returning each latency in microseconds."""
+    timings = []
+    for i in range(ITERATIONS):
+        start = time.perf_counter()
+        await statements.fetchrow(conn, TAG_GET, BENCH_GUILD, f"bench-{i % TAG_COUNT}")
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    """Print latency percentiles for `timings`."""
+    timings.sort()
+    print(
+        f"{label:<18} mean={statistics.fmean(timings):8.1f}us "
+        f"p50={timings[len(timings) // 2]:8.1f}us p99={timings[int(len(timings) * 0.99)]:8.1f}us",
+    )
+
+
+async def cold(dsn: str) -> tuple[list[float], list[float]]:
+    """Open `CONNECTIONS` connections, returning their connect and first lookup latencies in microseconds."""
+    connects, firsts = [], []
+    for i in range(CONNECTIONS):
+        start = time.perf_counter()
+        conn = await asyncpg.connect(dsn)
+        await init_connection(conn)
+        connected = time.perf_counter()
+        await statements.fetchrow(conn, TAG_GET, BENCH_GUILD, f"bench-{i % TAG_COUNT}")
+        done = time.perf_counter()
+        connects.append((connected - start) * 1_000_000)
+        firsts.append((done - connected) * 1_000_000)
+        await conn.close()
+    return connects, firsts
+
+
+async def main() -> None:
+    """Seed benchmark tags, time both modes and clean up."""
+    dsn = os.environ["SIDEBOT_BENCH_DSN"]
+    setup = await asyncpg.connect(dsn)
+    await migrate(setup)
+    await init_connection(setup)
+    await setup.executemany(
+        "INSERT INTO tags (guild_id, name, content, author, button_links) VALUES ($1, $2, $3, $4, $5)",
+        [(BENCH_GUILD, f"bench-{i}", "benchmark tag", DiscordUser(0, "bench"), []) for i in range(TAG_COUNT)],
+    )
+    try:
+        for label, enabled in (("baseline", False), ("registry", True)):
+            # Disabling the registry skips preparing on init, asyncpg still caches on first use.
+            statements.enabled = enabled
+            connects, firsts = await cold(dsn)
+            report(f"{label} connect", connects)
+            report(f"{label} first", firsts)
+            conn = await asyncpg.connect(dsn)
+            await init_connection(conn)
+            report(f"{label} steady", await run(conn))
+            await conn.close()
+    finally:
+        statements.enabled = True
+        await setup.execute("DELETE FROM tags WHERE guild_id = $1", BENCH_GUILD)
+        await setup.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
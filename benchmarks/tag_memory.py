@@ -0,0 +1,139 @@
+"""Memory benchmark for the tag record.
+
+Compares the memory held by 100k tags built as the previous `__dict__` based
+Tag (with its per-instance `_Tags` wrapper and dict based DiscordUser and
+ButtonLink) against the slotted, immutable `Tag` record. The strings and
+timestamps are shared by both, so only the objects themselves are measured.
+
+Usage: python -m benchmarks.tag_memory
+"""
+
+import datetime
+import gc
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from SideBot.db.tags import Tag
+from SideBot.utils import ButtonLink, DiscordUser
+
+TAG_COUNT = 100_000
+
+
+class LegacyDiscordUser:
+    """DiscordUser as it was before it had slots."""
+
+    def __init__(self, iden: int, name: str) -> None:
+        """Store the user."""
+        self.id = iden
+        self.name = name
+
+
+class LegacyButtonLink:
+    """ButtonLink as it was before it had slots."""
+
+    def __init__(self, label: str, url: str) -> None:
+        """Store the link."""
+        self.label = label
+        self.url = url
+
+
+class LegacyTags:
+    """The per-tag database wrapper the previous Tag built."""
+
+    def __init__(self, pool: Any) -> None:
+        """Store the pool."""
+        self.pool = pool
+
+
+class LegacyTag:
+    """Tag as it was before it became a slotted record."""
+
+    def __init__(
+        self,
+        guild_id: int,
+        tagname: str,
+        content: str,
+        author: LegacyDiscordUser,
+        created_at: datetime.datetime,
+        updated_at: datetime.datetime,
+        button_links: list[LegacyButtonLink],
+        used_count: int,
+        ident: int | None,
+        pool: Any,
+    ) -> None:
+        """Store the tag."""
+        self.guildid = guild_id
+        self.tagname = tagname
+        self.content = content
+        self.author = author
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.button_links = button_links
+        self.used_count = used_count
+        self.id = ident
+        self.tags = LegacyTags(pool)
+
+
+def measure(build: Callable[[], list[Any]]) -> int:
+    """Return the bytes still allocated by the result of `build`."""
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main() -> None:
+    """Build both kinds of tags and print their memory use."""
+    now = datetime.datetime.now(tz=datetime.UTC)
+    names = [f"tag-{i}" for i in range(TAG_COUNT)]
+    contents = [f"content of tag {i}" for i in range(TAG_COUNT)]
+    labels = ("Docs", "Source")
+    urls = ("https://example.com/docs", "https://example.com/src")
+    pool = object()
+
+    def legacy() -> list[Any]:
+        return [
+            LegacyTag(
+                1,
+                names[i],
+                contents[i],
+                LegacyDiscordUser(i, "author"),
+                now,
+                now,
+                [LegacyButtonLink(label, url) for label, url in zip(labels, urls, strict=True)],
+                i,
+                i,
+                pool,
+            )
+            for i in range(TAG_COUNT)
+        ]
+
+    def slotted() -> list[Any]:
+        return [
+            Tag(
+                1,
+                names[i],
+                contents[i],
+                DiscordUser(i, "author"),
+                now,
+                now,
+                tuple(ButtonLink(label, url) for label, url in zip(labels, urls, strict=True)),
+                i,
+                i,
+            )
+            for i in range(TAG_COUNT)
+        ]
+
+    before = measure(legacy)
+    after = measure(slotted)
+    print(f"{'dict Tag':<12} {before / 2**20:8.1f} MiB {before / TAG_COUNT:6.0f} B/tag")
+    print(f"{'slotted Tag':<12} {after / 2**20:8.1f} MiB {after / TAG_COUNT:6.0f} B/tag")
+    print(f"{after / before:.0%} of the previous memory")
+
+
+if __name__ == "__main__":
+    main()